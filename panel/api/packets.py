@@ -1,3 +1,7 @@
+from backend.utils.hwid_registry import hwid_registry
+from backend.utils.logging import log_info, log_warning
+
+
 class PacketProcessor:
     def __init__(self, session_manager):
         self.session_manager = session_manager
@@ -17,8 +21,20 @@ class PacketProcessor:
         return "LoginRequest"
 
     def process_login_request(self, client_socket, packet_data):
-        # Process login request
-        pass
+        session = self.session_manager.sessions.get(client_socket)
+        payload = bytes(packet_data).decode("utf-8", errors="ignore")
+
+        # The registry loads itself from the database on first use
+        with self.session_manager.app.app_context():
+            user_id = hwid_registry.match(payload)
+
+        if user_id is None:
+            log_warning(f"Login request with unknown HWID from {session.client_ip if session else 'unknown client'}")
+            return
+
+        if session:
+            session.is_logged_in = True
+        log_info(f"User with ID {user_id} logged in over socket")
 
     def process_handshake(self, client_socket, packet_data):
         # Process handshake
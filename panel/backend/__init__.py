@@ -4,6 +4,7 @@ from flask import Flask
 import logging
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+import os
 
 db = SQLAlchemy()
 
@@ -20,6 +21,8 @@ def create_app() -> Flask:
         True  # Only send cookies over https. Set to False if development in http.
     )
     app.config["JWT_COOKIE_CSRF_PROTECT"] = True  # Enable CSRF protection
+    # Embed roles and permissions in access tokens, so most requests skip the Users table
+    app.config["JWT_AUTHORIZATION_CLAIMS"] = False
 
     jwt = JWTManager(app)
     # Disable Flask"s default logging
@@ -32,9 +35,36 @@ def create_app() -> Flask:
     # App configuration
     app.config["SECRET_KEY"] = "ombra-hq-twizzy-up"
     app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.sqlite"
+    # memory:// counts per process, several workers need a shared store, e.g. redis://
+    app.config["RATELIMIT_STORAGE_URI"] = os.getenv("RATELIMIT_STORAGE_URI", "memory://")
+    # Pins the bcrypt cost, otherwise it is calibrated once and kept in the instance folder
+    if os.getenv("BCRYPT_ROUNDS"):
+        app.config["BCRYPT_ROUNDS"] = int(os.environ["BCRYPT_ROUNDS"])
+    # Set AUTO_MIGRATE=0 to apply migrations only through `flask migrate`
+    app.config["AUTO_MIGRATE"] = os.getenv("AUTO_MIGRATE", "1") != "0"
+    # Limits shared by every route of a blueprint, e.g. {"users": "600 per minute"}
+    app.config["BLUEPRINT_RATE_LIMITS"] = {}
+    # Per request query counts in X-Query-Count/Server-Timing, set SQL_INSTRUMENTATION=0 to disable
+    app.config["SQL_INSTRUMENTATION"] = os.getenv("SQL_INSTRUMENTATION", "1") != "0"
+    # Warn when one statement runs more often than this in a single request
+    app.config["N_PLUS_ONE_THRESHOLD"] = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+    # SQLite pragmas and pool sizes can be overridden with SQLITE_PRAGMAS and SQLALCHEMY_ENGINE_OPTIONS
+    from .database.engine import configure_engine, init_engine
+
+    configure_engine(app)
 
     # Initialize extensions
     db.init_app(app)
+    init_engine(app)
+
+    from .database.query_stats import init_query_stats
+
+    init_query_stats(app)
+
+    from .utils.passwords import init_passwords
+
+    init_passwords(app)
 
     # Import and register blueprints
     from .main import app as main_blueprint
@@ -77,5 +107,20 @@ def create_app() -> Flask:
 
     app.register_blueprint(discounts_blueprint)
 
-    CORS(app, supports_credentials=True)
+    from .utils.rate_limits import init_rate_limits
+
+    init_rate_limits(app)
+
+    # Blueprints import every model, so the schema is complete at this point
+    if app.config["AUTO_MIGRATE"]:
+        from .database.migrations import apply_migrations
+
+        with app.app_context():
+            apply_migrations()
+
+    from .cli import register_commands
+
+    register_commands(app)
+
+    CORS(app, supports_credentials=True, expose_headers=["X-Next-Cursor", "Retry-After", "X-Query-Count", "Server-Timing"])
     return app
@@ -0,0 +1,105 @@
+import click
+from flask import Flask
+
+
+def register_commands(app: Flask) -> None:
+    """Registers the maintenance commands, run them with `flask --app app <command>`."""
+
+    @app.cli.command("import-users")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "format", type=click.Choice(["csv", "ndjson"]))
+    @click.option("--batch-size", type=int, default=None, help="Rows per transaction.")
+    @click.option("--workers", type=int, default=None, help="Password hashing processes.")
+    @click.option("--ip", default="127.0.0.1", help="Register IP for rows without one.")
+    def import_users_command(path, format, batch_size, workers, ip):
+        """Imports users from a CSV or NDJSON file."""
+        from .user_import import IMPORT_BATCH_SIZE, detect_format, import_user_rows, read_rows
+
+        format = format or detect_format(path)
+        if format is None:
+            raise click.UsageError("Cannot tell the format from the file name, pass --format")
+
+        with open(path, "rb") as f:
+            report = import_user_rows(
+                read_rows(f, format),
+                ip=ip,
+                batch_size=batch_size or IMPORT_BATCH_SIZE,
+                workers=workers,
+            )
+
+        for error in report["errors"]:
+            click.echo(f"Row {error['row']}: {error['error']}", err=True)
+        click.echo(f"Imported {report['imported']} users, {report['failed']} rows failed")
+
+    @app.cli.command("generate-data")
+    @click.option("--users", type=int, default=10_000, show_default=True)
+    @click.option("--roles", type=int, default=10, show_default=True)
+    @click.option("--game-types", type=int, default=3, show_default=True)
+    @click.option("--games", type=int, default=10, show_default=True)
+    @click.option("--listings", type=int, default=50, show_default=True)
+    @click.option("--discounts", type=int, default=10, show_default=True)
+    @click.option("--roles-per-user", type=float, default=0.5, show_default=True)
+    @click.option("--games-per-user", type=float, default=1.0, show_default=True)
+    @click.option("--keys-per-user", type=float, default=0.5, show_default=True)
+    @click.option("--sessions-per-user", type=float, default=3.0, show_default=True)
+    @click.option("--subscriptions-per-user", type=float, default=0.3, show_default=True)
+    @click.option("--suspension-ratio", type=float, default=0.02, show_default=True)
+    @click.option("--batch-size", type=int, default=5_000, show_default=True, help="Users per transaction.")
+    @click.option("--seed", type=int, default=0, show_default=True, help="Same seed, same data.")
+    def generate_data_command(**options):
+        """Fills the database with synthetic users and related rows for scale testing."""
+        from .data_generator import DatasetConfig, generate_dataset
+
+        counts = generate_dataset(
+            DatasetConfig(**options),
+            progress=lambda done, total: click.echo(f"Users: {done}/{total}"),
+        )
+        for table, count in counts.items():
+            click.echo(f"{table}: {count}")
+
+    @app.cli.command("migrate")
+    @click.option("--check-plans", is_flag=True, help="Show hot query plans before and after.")
+    def migrate_command(check_plans):
+        """Applies pending schema migrations."""
+        from .database.migrations import LATEST_VERSION, apply_migrations, get_query_plans, get_schema_version
+
+        click.echo(f"Schema version {get_schema_version()}, latest {LATEST_VERSION}")
+        before = get_query_plans() if check_plans else {}
+        for migration in apply_migrations():
+            click.echo(f"Applied {migration.version}: {migration.description}")
+        if check_plans:
+            _echo_plans(before, get_query_plans())
+
+    @app.cli.command("query-plans")
+    def query_plans_command():
+        """Shows how SQLite runs the hot queries, exits with 1 if any scans a table."""
+        from .database.migrations import get_query_plans, is_scan
+
+        plans = get_query_plans()
+        _echo_plans(plans, plans)
+        if any(is_scan(plan) for plan in plans.values()):
+            raise SystemExit(1)
+
+    @app.cli.command("benchmark-sqlite")
+    @click.option("--readers", type=int, default=4, show_default=True)
+    @click.option("--writers", type=int, default=2, show_default=True)
+    @click.option("--seconds", type=float, default=5.0, show_default=True, help="Per run.")
+    def benchmark_sqlite_command(readers, writers, seconds):
+        """Compares concurrent reads and writes with SQLite defaults and the app's pragmas."""
+        from .database.benchmark import run_benchmark
+        from .database.engine import get_sqlite_pragmas
+
+        pragmas = get_sqlite_pragmas(app)
+        timeout = int(pragmas["busy_timeout"]) / 1000
+        for name, profile in (("defaults", None), ("profile", pragmas)):
+            summary = run_benchmark(profile, readers, writers, seconds, timeout)
+            click.echo(f"{name:<9} " + "  ".join(f"{key}: {value}" for key, value in summary.items()))
+
+
+def _echo_plans(before: dict[str, list[str]], after: dict[str, list[str]]) -> None:
+    from .database.migrations import is_scan
+
+    for name, plan in after.items():
+        click.echo(f"{'SCAN  ' if is_scan(plan) else 'ok    '}{name}: {'; '.join(plan)}")
+        if before.get(name, plan) != plan:
+            click.echo(f"      was: {'; '.join(before[name])}")
@@ -0,0 +1,322 @@
+import math
+import random
+import string
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+from sqlalchemy import func, insert
+from .database.models import (
+    db,
+    User,
+    Role,
+    Game,
+    GameType,
+    Settings,
+    UserRole,
+    UserGame,
+    UserSettings,
+    Key,
+    Session,
+    Suspension,
+    Listing,
+    Discount,
+    DiscountIntent,
+    Subscription,
+    UserStatus,
+)
+from .utils.passwords import hash_password
+from .utils.utils import male_names
+
+GENERATED_PASSWORD = "password"
+# Dates are spread before this point, so the same seed always yields the same rows
+DEFAULT_ANCHOR = datetime(2025, 1, 1)
+
+
+@dataclass
+class DatasetConfig:
+    """Sizes of the generated dataset. Per-user values are averages."""
+
+    users: int = 10_000
+    roles: int = 10
+    game_types: int = 3
+    games: int = 10
+    listings: int = 50
+    discounts: int = 10
+    roles_per_user: float = 0.5
+    games_per_user: float = 1.0
+    keys_per_user: float = 0.5
+    sessions_per_user: float = 3.0
+    subscriptions_per_user: float = 0.3
+    suspension_ratio: float = 0.02
+    batch_size: int = 5_000
+    seed: int = 0
+    anchor: datetime = DEFAULT_ANCHOR
+
+
+def generate_dataset(
+    config: DatasetConfig, progress: Optional[Callable[[int, int], None]] = None
+) -> dict[str, int]:
+    """Fills every table with synthetic rows using batched INSERTs, one commit per batch.
+
+    Generated rows are appended next to existing data, names continue after the
+    current maximum ids. All users share GENERATED_PASSWORD, hashed once, since
+    bcrypt for millions of rows would dominate the run. Returns the row count
+    inserted per table.
+    """
+    return _Generator(config, progress).run()
+
+
+class _Generator:
+    def __init__(self, config: DatasetConfig, progress):
+        self.config = config
+        self.progress = progress
+        self.rng = random.Random(config.seed)
+        self.counts: dict[str, int] = {}
+        self.used_colors = set(db.session.scalars(db.select(Role.color))) | set(
+            db.session.scalars(db.select(GameType.color))
+        ) | set(db.session.scalars(db.select(Game.color)))
+
+    def run(self) -> dict[str, int]:
+        config = self.config
+        # Users only get generated roles (plus Member), never e.g. Admin
+        role_ids = self._insert_named(
+            Role, config.roles, "Role", lambda name: {"description": f"Generated {name}"}
+        )
+        member = Role.get_by_name("Member")
+        game_type_ids = self._insert_named(
+            GameType, config.game_types, "GameType", lambda name: {"description": f"Generated {name}"}
+        ) or list(db.session.scalars(db.select(GameType.gameTypeId)))
+        game_ids = self._insert_named(
+            Game, config.games, "Game", lambda name: {"gameTypeId": self.rng.choice(game_type_ids)}
+        ) or list(db.session.scalars(db.select(Game.gameId)))
+        if not game_type_ids or not game_ids:
+            raise ValueError("At least one game type and game are needed, generate some or insert defaults")
+        db.session.commit()
+
+        discount_ids = self._insert_returning(
+            Discount,
+            [
+                {
+                    "name": f"Discount {i}",
+                    "startDate": self._date_before(365),
+                    "endDate": self._date_after(90),
+                    "discount": round(self.rng.uniform(0.05, 0.5), 2),
+                    "isActive": self.rng.random() < 0.7,
+                }
+                for i in range(config.discounts)
+            ],
+        )
+        listings = [
+            {
+                "name": f"Listing {i}",
+                "description": f"Generated listing {i}",
+                "gameId": self.rng.choice(game_ids),
+                "price": round(self.rng.uniform(1, 100), 2),
+                "copies": self.rng.randint(10, 10_000),
+                "sold": self.rng.randint(0, 10),
+                "isActive": self.rng.random() < 0.8,
+                "discountId": (
+                    self.rng.choice(discount_ids)
+                    if discount_ids and self.rng.random() < 0.3
+                    else None
+                ),
+            }
+            for i in range(config.listings)
+        ]
+        listing_ids = self._insert_returning(Listing, listings)
+        self._insert(
+            DiscountIntent,
+            [
+                {"discountId": listing["discountId"], "listingId": listingId}
+                for listing, listingId in zip(listings, listing_ids)
+                if listing["discountId"] is not None
+            ],
+        )
+        db.session.commit()
+
+        password = hash_password(GENERATED_PASSWORD)
+        first_index = (db.session.scalar(db.select(func.max(User.userId))) or 0) + 1
+        for start in range(0, config.users, config.batch_size):
+            count = min(config.batch_size, config.users - start)
+            self._insert_users(
+                first_index + start,
+                count,
+                password,
+                member.roleId if member else None,
+                role_ids,
+                game_ids,
+                game_type_ids,
+                listing_ids,
+            )
+            db.session.commit()
+            if self.progress:
+                self.progress(start + count, config.users)
+
+        return self.counts
+
+    def _insert_users(
+        self, first_index, count, password, member_role_id, role_ids, game_ids, game_type_ids, listing_ids
+    ) -> None:
+        config, rng = self.config, self.rng
+        statuses = [status.value for status in UserStatus]
+
+        users = []
+        for index in range(first_index, first_index + count):
+            username = f"{rng.choice(male_names).lower()}{index}"
+            registered = self._date_before(730)
+            subscribed = rng.random() < 0.6
+            last_login = self._date_before(60)
+            users.append(
+                {
+                    "username": username,
+                    "email": f"{username}@example.com",
+                    "password": password,
+                    "HWID": self._token(34) if rng.random() < 0.9 else "",
+                    "registerDate": registered,
+                    "registerIP": self._ip(),
+                    "subscriptionStart": registered if subscribed else None,
+                    "subscriptionEnd": self._date_after(365) if subscribed else None,
+                    "lastLogin": last_login,
+                    "lastEdit": max(registered, last_login),
+                    "lastIP": self._ip(),
+                    "status": rng.choices(statuses, weights=(70, 3, 2, 25))[0],
+                }
+            )
+        user_ids = self._insert_returning(User, users)
+
+        settings_ids = self._insert_returning(Settings, [{"language": "en"} for _ in user_ids])
+        self._insert(
+            UserSettings,
+            [{"userId": u, "settingsId": s} for u, s in zip(user_ids, settings_ids)],
+        )
+
+        user_roles, user_games, keys, sessions, suspensions, subscriptions = [], [], [], [], [], []
+        for userId in user_ids:
+            roles = set(self._sample(role_ids, config.roles_per_user))
+            if member_role_id is not None:
+                roles.add(member_role_id)
+            user_roles.extend({"userId": userId, "roleId": roleId} for roleId in roles)
+            user_games.extend(
+                {"userId": userId, "gameId": gameId}
+                for gameId in set(self._sample(game_ids, config.games_per_user))
+            )
+            for _ in range(self._poisson(config.keys_per_user)):
+                used = rng.random() < 0.5
+                keys.append(
+                    {
+                        "key": self._token(32),
+                        "gameTypeId": rng.choice(game_type_ids),
+                        "gameId": rng.choice(game_ids),
+                        "createdBy": user_ids[0],
+                        "usedBy": userId if used else None,
+                        "createdAt": self._date_before(365),
+                        "usedAt": self._date_before(30) if used else None,
+                        "isUsed": used,
+                    }
+                )
+            for _ in range(self._poisson(config.sessions_per_user)):
+                sessions.append(
+                    {
+                        "userId": userId,
+                        "gameId": rng.choice(game_ids),
+                        "status": rng.choice(("active", "Inactive")),
+                        "createdAt": self._date_before(90),
+                    }
+                )
+            if rng.random() < config.suspension_ratio:
+                status = rng.choice((UserStatus.Banned.value, UserStatus.Frozen.value))
+                suspended = self._date_before(180)
+                suspensions.append(
+                    {
+                        "userId": userId,
+                        "reason": f"Status changed to {status}",
+                        "HWID": None,
+                        "status": status,
+                        "suspendedBy": user_ids[0],
+                        "suspensionStart": suspended,
+                        "suspensionEnd": self._date_after(180) if rng.random() < 0.5 else None,
+                        "isActive": rng.random() < 0.8,
+                        "lastEdit": suspended,
+                    }
+                )
+            if listing_ids:
+                for _ in range(self._poisson(config.subscriptions_per_user)):
+                    subscriptions.append(
+                        {
+                            "userId": userId,
+                            "listingId": rng.choice(listing_ids),
+                            "startDate": self._date_before(365),
+                            "endDate": self._date_after(365),
+                            "isActive": rng.random() < 0.7,
+                        }
+                    )
+
+        self._insert(UserRole, user_roles)
+        self._insert(UserGame, user_games)
+        self._insert(Key, keys)
+        self._insert(Session, sessions)
+        self._insert(Suspension, suspensions)
+        self._insert(Subscription, subscriptions)
+
+    def _insert_named(self, model, count: int, label: str, values) -> list[int]:
+        """Inserts count rows with unique generated names and colors, returns their ids."""
+        existing = set(db.session.scalars(db.select(model.name)))
+        rows, i = [], 0
+        while len(rows) < count:
+            i += 1
+            name = f"{label} {i}"
+            if name in existing:
+                continue
+            row = {"name": name, **values(name)}
+            if "color" in model.__table__.columns:
+                row["color"] = self._color()
+            rows.append(row)
+        return self._insert_returning(model, rows)
+
+    def _insert_returning(self, model, rows: list[dict[str, Any]]) -> list[int]:
+        if not rows:
+            return []
+        key = model.__mapper__.primary_key[0]
+        ids = db.session.scalars(
+            insert(model).returning(key, sort_by_parameter_order=True), rows
+        ).all()
+        self._count(model, len(rows))
+        return ids
+
+    def _insert(self, model, rows: list[dict[str, Any]]) -> None:
+        if rows:
+            db.session.execute(insert(model), rows)
+            self._count(model, len(rows))
+
+    def _count(self, model, count: int) -> None:
+        self.counts[model.__tablename__] = self.counts.get(model.__tablename__, 0) + count
+
+    def _sample(self, ids: list[int], average: float) -> list[int]:
+        return [self.rng.choice(ids) for _ in range(self._poisson(average))] if ids else []
+
+    def _poisson(self, average: float) -> int:
+        # Knuth's method, the averages here are small
+        limit, count, product = math.exp(-average), 0, self.rng.random()
+        while product > limit:
+            count += 1
+            product *= self.rng.random()
+        return count
+
+    def _color(self) -> str:
+        while True:
+            color = f"#{self.rng.randrange(0x1000000):06x}"
+            if color not in self.used_colors:
+                self.used_colors.add(color)
+                return color
+
+    def _token(self, length: int) -> str:
+        return "".join(self.rng.choices(string.ascii_letters + string.digits, k=length))
+
+    def _ip(self) -> str:
+        return ".".join(str(self.rng.randint(1, 254)) for _ in range(4))
+
+    def _date_before(self, days: int) -> datetime:
+        return self.config.anchor - timedelta(seconds=self.rng.randrange(days * 86400))
+
+    def _date_after(self, days: int) -> datetime:
+        return self.config.anchor + timedelta(seconds=self.rng.randrange(days * 86400))
@@ -0,0 +1,246 @@
+"""The schema as it was when migrations were introduced, migration 1.
+
+Frozen on purpose, this is the DDL the models produced at that time. Later
+schema changes go into new migrations, never here.
+"""
+
+TABLES = (
+    """CREATE TABLE IF NOT EXISTS "AuthVersions" (
+    "userId" INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY ("userId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "DeletedRows" (
+    "deletedRowId" INTEGER NOT NULL,
+    "tableName" VARCHAR(50) NOT NULL,
+    "rowId" INTEGER NOT NULL,
+    "deletedAt" DATETIME NOT NULL,
+    PRIMARY KEY ("deletedRowId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "Discounts" (
+    "discountId" INTEGER NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    "startDate" DATETIME NOT NULL,
+    "endDate" DATETIME,
+    discount FLOAT NOT NULL,
+    "isActive" BOOLEAN,
+    PRIMARY KEY ("discountId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "GameTypes" (
+    "gameTypeId" INTEGER NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    description VARCHAR(255) NOT NULL,
+    color VARCHAR(7) NOT NULL,
+    PRIMARY KEY ("gameTypeId"),
+    UNIQUE (name),
+    UNIQUE (color)
+)""",
+    """CREATE TABLE IF NOT EXISTS "Permissions" (
+    "permissionId" INTEGER NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    description VARCHAR(255) NOT NULL,
+    PRIMARY KEY ("permissionId"),
+    UNIQUE (name)
+)""",
+    """CREATE TABLE IF NOT EXISTS "Roles" (
+    "roleId" INTEGER NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    description VARCHAR(255) NOT NULL,
+    color VARCHAR(7) NOT NULL,
+    PRIMARY KEY ("roleId"),
+    UNIQUE (name),
+    UNIQUE (color)
+)""",
+    """CREATE TABLE IF NOT EXISTS "Settings" (
+    "settingsId" INTEGER NOT NULL,
+    language VARCHAR(2) NOT NULL,
+    date VARCHAR(10) NOT NULL,
+    time VARCHAR(2) NOT NULL,
+    currency VARCHAR(3) NOT NULL,
+    PRIMARY KEY ("settingsId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "Users" (
+    "userId" INTEGER NOT NULL,
+    username VARCHAR(30) NOT NULL,
+    email VARCHAR(100) NOT NULL,
+    password VARCHAR(60) NOT NULL,
+    "HWID" VARCHAR(200),
+    "registerDate" DATETIME NOT NULL,
+    "registerIP" VARCHAR(40) NOT NULL,
+    "subscriptionStart" DATETIME,
+    "subscriptionEnd" DATETIME,
+    "lastLogin" DATETIME,
+    "lastEdit" DATETIME NOT NULL,
+    "lastIP" VARCHAR(50) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    PRIMARY KEY ("userId"),
+    UNIQUE (username),
+    UNIQUE (email)
+)""",
+    """CREATE TABLE IF NOT EXISTS "Games" (
+    "gameId" INTEGER NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    "gameTypeId" INTEGER,
+    color VARCHAR(7) NOT NULL,
+    PRIMARY KEY ("gameId"),
+    UNIQUE (name),
+    FOREIGN KEY("gameTypeId") REFERENCES "GameTypes" ("gameTypeId"),
+    UNIQUE (color)
+)""",
+    """CREATE TABLE IF NOT EXISTS "InviteCodes" (
+    "inviteId" INTEGER NOT NULL,
+    code VARCHAR(200) NOT NULL,
+    "createdBy" INTEGER NOT NULL,
+    "createdAt" DATETIME NOT NULL,
+    "usedBy" INTEGER,
+    "usedAt" DATETIME,
+    "isActive" BOOLEAN,
+    "lastEdit" DATETIME,
+    PRIMARY KEY ("inviteId"),
+    FOREIGN KEY("createdBy") REFERENCES "Users" ("userId"),
+    FOREIGN KEY("usedBy") REFERENCES "Users" ("userId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "RolePermissions" (
+    "roleId" INTEGER NOT NULL,
+    "permissionId" INTEGER NOT NULL,
+    PRIMARY KEY ("roleId", "permissionId"),
+    FOREIGN KEY("roleId") REFERENCES "Roles" ("roleId"),
+    FOREIGN KEY("permissionId") REFERENCES "Permissions" ("permissionId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "Suspensions" (
+    "suspensionId" INTEGER NOT NULL,
+    "userId" INTEGER NOT NULL,
+    reason VARCHAR(200) NOT NULL,
+    "HWID" VARCHAR(200),
+    status VARCHAR(50) NOT NULL,
+    "suspendedBy" INTEGER NOT NULL,
+    "suspensionStart" DATETIME NOT NULL,
+    "suspensionEnd" DATETIME,
+    "isActive" BOOLEAN NOT NULL,
+    "lastEdit" DATETIME,
+    PRIMARY KEY ("suspensionId"),
+    FOREIGN KEY("userId") REFERENCES "Users" ("userId"),
+    FOREIGN KEY("suspendedBy") REFERENCES "Users" ("userId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "UserRoles" (
+    "userId" INTEGER NOT NULL,
+    "roleId" INTEGER NOT NULL,
+    PRIMARY KEY ("userId", "roleId"),
+    FOREIGN KEY("userId") REFERENCES "Users" ("userId"),
+    FOREIGN KEY("roleId") REFERENCES "Roles" ("roleId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "UserSettings" (
+    "userId" INTEGER NOT NULL,
+    "settingsId" INTEGER NOT NULL,
+    PRIMARY KEY ("userId", "settingsId"),
+    FOREIGN KEY("userId") REFERENCES "Users" ("userId"),
+    FOREIGN KEY("settingsId") REFERENCES "Settings" ("settingsId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "Keys" (
+    "keyId" INTEGER NOT NULL,
+    "key" VARCHAR(200) NOT NULL,
+    "gameTypeId" INTEGER,
+    "gameId" INTEGER,
+    "createdBy" INTEGER NOT NULL,
+    "usedBy" INTEGER,
+    "createdAt" DATETIME NOT NULL,
+    "usedAt" DATETIME,
+    "isUsed" BOOLEAN,
+    PRIMARY KEY ("keyId"),
+    UNIQUE ("key"),
+    FOREIGN KEY("gameTypeId") REFERENCES "GameTypes" ("gameTypeId"),
+    FOREIGN KEY("gameId") REFERENCES "Games" ("gameId"),
+    FOREIGN KEY("createdBy") REFERENCES "Users" ("userId"),
+    FOREIGN KEY("usedBy") REFERENCES "Users" ("userId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "Listings" (
+    "listingId" INTEGER NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    description VARCHAR(255) NOT NULL,
+    "gameId" INTEGER NOT NULL,
+    price FLOAT NOT NULL,
+    copies INTEGER NOT NULL,
+    sold INTEGER NOT NULL,
+    "isActive" BOOLEAN,
+    "discountId" INTEGER,
+    PRIMARY KEY ("listingId"),
+    FOREIGN KEY("gameId") REFERENCES "Games" ("gameId"),
+    FOREIGN KEY("discountId") REFERENCES "Discounts" ("discountId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "Sessions" (
+    "sessionId" INTEGER NOT NULL,
+    "userId" INTEGER NOT NULL,
+    "gameId" INTEGER NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    "createdAt" DATETIME,
+    PRIMARY KEY ("sessionId"),
+    FOREIGN KEY("userId") REFERENCES "Users" ("userId"),
+    FOREIGN KEY("gameId") REFERENCES "Games" ("gameId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "UserGames" (
+    "userId" INTEGER NOT NULL,
+    "gameId" INTEGER NOT NULL,
+    PRIMARY KEY ("userId", "gameId"),
+    FOREIGN KEY("userId") REFERENCES "Users" ("userId"),
+    FOREIGN KEY("gameId") REFERENCES "Games" ("gameId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "DiscountIntents" (
+    "discountIntentId" INTEGER NOT NULL,
+    "discountId" INTEGER NOT NULL,
+    "listingId" INTEGER NOT NULL,
+    PRIMARY KEY ("discountIntentId"),
+    FOREIGN KEY("discountId") REFERENCES "Discounts" ("discountId"),
+    FOREIGN KEY("listingId") REFERENCES "Listings" ("listingId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "RoleListings" (
+    "roleId" INTEGER NOT NULL,
+    "listingId" INTEGER NOT NULL,
+    PRIMARY KEY ("roleId", "listingId"),
+    FOREIGN KEY("roleId") REFERENCES "Roles" ("roleId"),
+    FOREIGN KEY("listingId") REFERENCES "Listings" ("listingId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "SessionLogs" (
+    "sessionLogId" INTEGER NOT NULL,
+    "sessionId" INTEGER NOT NULL,
+    PRIMARY KEY ("sessionLogId"),
+    FOREIGN KEY("sessionId") REFERENCES "Sessions" ("sessionId")
+)""",
+    """CREATE TABLE IF NOT EXISTS "Subscriptions" (
+    "subscriptionId" INTEGER NOT NULL,
+    "userId" INTEGER NOT NULL,
+    "listingId" INTEGER NOT NULL,
+    "startDate" DATETIME NOT NULL,
+    "endDate" DATETIME,
+    "isActive" BOOLEAN,
+    PRIMARY KEY ("subscriptionId"),
+    FOREIGN KEY("userId") REFERENCES "Users" ("userId"),
+    FOREIGN KEY("listingId") REFERENCES "Listings" ("listingId")
+)""",
+)
+
+# Unique indexes can fail on existing duplicates, they are created one by one
+INDEXES = (
+    """CREATE INDEX IF NOT EXISTS "ix_DeletedRows_tableName_deletedAt" ON "DeletedRows" ("tableName", "deletedAt")""",
+    """CREATE INDEX IF NOT EXISTS "ix_Users_lastEdit" ON "Users" ("lastEdit")""",
+    """CREATE UNIQUE INDEX IF NOT EXISTS "ux_Users_HWID" ON "Users" ("HWID") WHERE HWID IS NOT NULL AND HWID != ''""",
+    """CREATE INDEX IF NOT EXISTS "ix_Suspensions_lastEdit" ON "Suspensions" ("lastEdit")""",
+)
+
+# database/search.py at the time, the FTS5 table over Users and its triggers
+SEARCH = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS UsersSearch USING fts5(
+    username, email, HWID, registerIP, lastIP, content='Users', content_rowid='userId', tokenize='trigram'
+)""",
+    """CREATE TRIGGER IF NOT EXISTS UsersSearch_insert AFTER INSERT ON Users BEGIN
+    INSERT INTO UsersSearch(rowid, username, email, HWID, registerIP, lastIP) VALUES (new.userId, new.username, new.email, new.HWID, new.registerIP, new.lastIP);
+END""",
+    """CREATE TRIGGER IF NOT EXISTS UsersSearch_delete AFTER DELETE ON Users BEGIN
+    INSERT INTO UsersSearch(UsersSearch, rowid, username, email, HWID, registerIP, lastIP)
+    VALUES ('delete', old.userId, old.username, old.email, old.HWID, old.registerIP, old.lastIP);
+END""",
+    """CREATE TRIGGER IF NOT EXISTS UsersSearch_update AFTER UPDATE OF username, email, HWID, registerIP, lastIP ON Users BEGIN
+    INSERT INTO UsersSearch(UsersSearch, rowid, username, email, HWID, registerIP, lastIP)
+    VALUES ('delete', old.userId, old.username, old.email, old.HWID, old.registerIP, old.lastIP);
+    INSERT INTO UsersSearch(rowid, username, email, HWID, registerIP, lastIP) VALUES (new.userId, new.username, new.email, new.HWID, new.registerIP, new.lastIP);
+END""",
+)
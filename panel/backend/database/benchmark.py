@@ -0,0 +1,107 @@
+import os
+import random
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from .engine import set_sqlite_pragmas
+
+# Rows in the table readers query, so reads do real page lookups
+SEED_ROWS = 10_000
+
+
+@dataclass
+class BenchmarkResult:
+    reads: int = 0
+    writes: int = 0
+    locked: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+    def summary(self, seconds: float) -> dict[str, Any]:
+        latencies = sorted(self.latencies)
+        p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+        return {
+            "reads/s": round(self.reads / seconds),
+            "writes/s": round(self.writes / seconds),
+            "locked": self.locked,
+            "p99 ms": round(p99 * 1000, 1),
+        }
+
+
+def run_benchmark(
+    pragmas: Optional[dict[str, Any]],
+    readers: int = 4,
+    writers: int = 2,
+    seconds: float = 5.0,
+    timeout: float = 5.0,
+) -> dict[str, Any]:
+    """Runs concurrent readers and writers against a scratch database file.
+
+    pragmas=None leaves SQLite's defaults, i.e. a rollback journal with FULL
+    sync, to compare against an engine profile. Each write is its own
+    transaction, like a request that changes one row.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(directory, 'benchmark.sqlite')}",
+            connect_args={"timeout": timeout, "check_same_thread": False},
+            pool_size=readers + writers,
+        )
+        if pragmas:
+            event.listen(engine, "connect", lambda c, r: set_sqlite_pragmas(c, pragmas))
+
+        with engine.begin() as connection:
+            connection.execute(
+                text("CREATE TABLE Items (itemId INTEGER PRIMARY KEY, value TEXT NOT NULL)")
+            )
+            connection.execute(
+                text("INSERT INTO Items (value) VALUES (:value)"),
+                [{"value": f"item {i}"} for i in range(SEED_ROWS)],
+            )
+
+        result, lock = BenchmarkResult(), threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def worker(write: bool) -> None:
+            rng = random.Random()
+            local = BenchmarkResult()
+            with engine.connect() as connection:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        if write:
+                            connection.execute(
+                                text("UPDATE Items SET value = :value WHERE itemId = :itemId"),
+                                {"value": str(start), "itemId": rng.randint(1, SEED_ROWS)},
+                            )
+                            connection.commit()
+                            local.writes += 1
+                        else:
+                            connection.execute(
+                                text("SELECT count(*) FROM Items WHERE itemId BETWEEN :low AND :low + 100"),
+                                {"low": rng.randint(1, SEED_ROWS)},
+                            ).scalar()
+                            connection.rollback()
+                            local.reads += 1
+                    except OperationalError:
+                        connection.rollback()
+                        local.locked += 1
+                    local.latencies.append(time.perf_counter() - start)
+            with lock:
+                result.reads += local.reads
+                result.writes += local.writes
+                result.locked += local.locked
+                result.latencies.extend(local.latencies)
+
+        threads = [threading.Thread(target=worker, args=(False,)) for _ in range(readers)]
+        threads += [threading.Thread(target=worker, args=(True,)) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    return result.summary(seconds)
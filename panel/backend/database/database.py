@@ -13,9 +13,16 @@ cet = ZoneInfo("Europe/Prague")
 time_format = "%d.%m.%Y %H:%M:%S"
 datetime_now = datetime.now(cet)
 datetime_now_str = datetime_now.strftime(time_format)
+
+
+def current_datetime() -> datetime:
+    # datetime_now is frozen at import, change timestamps need the actual time
+    return datetime.now(cet)
+
      
 app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.sqlite"
+# Same override as configure_engine, importing this module must not touch another database
+app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URI", "sqlite:///database.sqlite")
 db = SQLAlchemy(app)
 
 class UserStatus(Enum):
@@ -334,10 +341,25 @@ class User(db.Model):
     subscriptionStart = db.Column(db.DateTime)
     subscriptionEnd = db.Column(db.DateTime)
     lastLogin = db.Column(db.DateTime)
-    lastEdit = db.Column(db.DateTime, nullable=False, default=lambda: datetime_now)
+    lastEdit = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=current_datetime,
+        onupdate=current_datetime,
+        index=True,
+    )
     lastIP = db.Column(db.String(50), nullable=False)
     status = db.Column(db.String(50), nullable=False, default=UserStatus.Inactive.value)
 
+    __table_args__ = (
+        db.Index(
+            "ux_Users_HWID",
+            "HWID",
+            unique=True,
+            sqlite_where=db.text("HWID IS NOT NULL AND HWID != ''"),
+        ),
+    )
+
     @classmethod
     def get_all(cls) -> list["User"]:
         return User.query.all()
@@ -570,7 +592,7 @@ class User(db.Model):
 class UserRole(db.Model):
     __tablename__ = "UserRoles"
     userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), primary_key=True)
-    roleId = db.Column(db.Integer, db.ForeignKey("Roles.roleId"), primary_key=True)
+    roleId = db.Column(db.Integer, db.ForeignKey("Roles.roleId"), primary_key=True, index=True)
 
     @classmethod
     def get_by_id(cls, userId: int, roleId: int) -> "UserRole | None":
@@ -600,7 +622,7 @@ class UserRole(db.Model):
 class UserGame(db.Model):
     __tablename__ = "UserGames"
     userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), primary_key=True)
-    gameId = db.Column(db.Integer, db.ForeignKey("Games.gameId"), primary_key=True)
+    gameId = db.Column(db.Integer, db.ForeignKey("Games.gameId"), primary_key=True, index=True)
 
     @classmethod
     def get_by_userId(cls, userId: int) -> list["UserGame"]:
@@ -646,8 +668,8 @@ class UserSettings(db.Model):
 class Session(db.Model):
     __tablename__ = "Sessions"
     sessionId = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False)
-    gameId = db.Column(db.Integer, db.ForeignKey("Games.gameId"), nullable=False)
+    userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False, index=True)
+    gameId = db.Column(db.Integer, db.ForeignKey("Games.gameId"), nullable=False, index=True)
     status = db.Column(db.String(50), nullable=False)  # TODO: Change it to Enum
     createdAt = db.Column(db.DateTime, default=lambda: datetime_now)
 
@@ -705,17 +727,19 @@ typedef enum {
 class Suspension(db.Model): # TODO: pridat security report type
     __tablename__ = "Suspensions"
     suspensionId = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False)
+    userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False, index=True)
     reason = db.Column(db.String(200), nullable=False)
     HWID = db.Column(db.String(200))
     status = db.Column(db.String(50), nullable=False)  # TODO: Change it to Enum
-    suspendedBy = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False)
+    suspendedBy = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False, index=True)
     suspensionStart = db.Column(
         db.DateTime, nullable=False, default=lambda: datetime_now
     )
     suspensionEnd = db.Column(db.DateTime)
     isActive = db.Column(db.Boolean, nullable=False, default=True)
-    lastEdit = db.Column(db.DateTime, default=lambda: datetime_now)
+    lastEdit = db.Column(
+        db.DateTime, default=current_datetime, onupdate=current_datetime, index=True
+    )
 
     @classmethod
     def get_all(cls) -> list["Suspension"]:
@@ -775,7 +799,28 @@ class Suspension(db.Model): # TODO: pridat security report type
         self.suspensionStart = suspensionStart if suspensionStart else datetime_now
         self.suspensionEnd = suspensionEnd
         self.isActive = isActive
-        self.lastEdit = datetime_now
+        self.lastEdit = current_datetime()
+
+
+class DeletedRow(db.Model):
+    __tablename__ = "DeletedRows"
+    deletedRowId = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    tableName = db.Column(db.String(50), nullable=False)
+    rowId = db.Column(db.Integer, nullable=False)
+    deletedAt = db.Column(db.DateTime, nullable=False, default=current_datetime)
+
+    __table_args__ = (db.Index("ix_DeletedRows_tableName_deletedAt", "tableName", "deletedAt"),)
+
+    def __init__(self, tableName: str, rowId: int):
+        self.tableName = tableName
+        self.rowId = rowId
+        self.deletedAt = current_datetime()
+
+
+class AuthVersion(db.Model):
+    __tablename__ = "AuthVersions"
+    userId = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
 
 
 class InviteCode(db.Model):
@@ -810,10 +855,10 @@ class Key(db.Model):
     __tablename__ = "Keys"
     keyId = db.Column(db.Integer, primary_key=True, autoincrement=True)
     key = db.Column(db.String(200), nullable=False, unique=True)
-    gameTypeId = db.Column(db.Integer, db.ForeignKey("GameTypes.gameTypeId"))
-    gameId = db.Column(db.Integer, db.ForeignKey("Games.gameId"))
-    createdBy = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False)
-    usedBy = db.Column(db.Integer, db.ForeignKey("Users.userId"))
+    gameTypeId = db.Column(db.Integer, db.ForeignKey("GameTypes.gameTypeId"), index=True)
+    gameId = db.Column(db.Integer, db.ForeignKey("Games.gameId"), index=True)
+    createdBy = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False, index=True)
+    usedBy = db.Column(db.Integer, db.ForeignKey("Users.userId"), index=True)
     createdAt = db.Column(db.DateTime, nullable=False, default=lambda: datetime_now)
     usedAt = db.Column(db.DateTime)
     isUsed = db.Column(db.Boolean, default=False)
@@ -970,8 +1015,8 @@ class Listing(db.Model):
 class DiscountIntent(db.Model):
     __tablename__ = "DiscountIntents"
     discountIntentId = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    discountId = db.Column(db.Integer, db.ForeignKey("Discounts.discountId"), nullable=False)
-    listingId = db.Column(db.Integer, db.ForeignKey("Listings.listingId"), nullable=False)
+    discountId = db.Column(db.Integer, db.ForeignKey("Discounts.discountId"), nullable=False, index=True)
+    listingId = db.Column(db.Integer, db.ForeignKey("Listings.listingId"), nullable=False, index=True)
 
     discount = db.relationship("Discount", back_populates="intended_listings")
     listing = db.relationship("Listing", back_populates="intended_discounts")
@@ -1040,12 +1085,12 @@ class Discount(db.Model):
 class Subscription(db.Model):
     __tablename__ = "Subscriptions"
     subscriptionId = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False)
+    userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False, index=True)
     listingId = db.Column(
-        db.Integer, db.ForeignKey("Listings.listingId"), nullable=False
+        db.Integer, db.ForeignKey("Listings.listingId"), nullable=False, index=True
     )
     startDate = db.Column(db.DateTime, nullable=False, default=lambda: datetime_now)
-    endDate = db.Column(db.DateTime)
+    endDate = db.Column(db.DateTime, index=True)
     isActive = db.Column(db.Boolean, default=True)
 
     @classmethod
@@ -0,0 +1,85 @@
+import os
+from typing import Any
+from flask import Flask
+from sqlalchemy import event
+from .. import db
+
+# Applied to every new SQLite connection. WAL lets readers run while a write
+# is in progress, NORMAL only syncs at checkpoints, which is still safe in WAL.
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,  # ms to wait for a lock before "database is locked"
+    "cache_size": -65536,  # negative is KiB, 64MB per connection
+    "mmap_size": 268435456,  # 256MB
+    "temp_store": "MEMORY",
+}
+
+DEFAULT_POOL_OPTIONS = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 30,
+    "pool_recycle": 3600,
+}
+
+
+def get_sqlite_pragmas(app: Flask) -> dict[str, Any]:
+    """DEFAULT_SQLITE_PRAGMAS updated with SQLITE_PRAGMAS and SQLITE_<PRAGMA> variables."""
+    pragmas = {**DEFAULT_SQLITE_PRAGMAS, **app.config.get("SQLITE_PRAGMAS", {})}
+    for name in pragmas:
+        value = os.getenv(f"SQLITE_{name.upper()}")
+        if value is not None:
+            pragmas[name] = value
+    return pragmas
+
+
+def set_sqlite_pragmas(dbapi_connection, pragmas: dict[str, Any]) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            # PRAGMA does not take bound parameters, values come from config only
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+def configure_engine(app: Flask) -> None:
+    """Sets the engine options from the app config, call before db.init_app.
+
+    DATABASE_URI overrides the database, SQLALCHEMY_ENGINE_OPTIONS entries
+    take precedence over DEFAULT_POOL_OPTIONS.
+    """
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
+        "DATABASE_URI", app.config.get("SQLALCHEMY_DATABASE_URI", "sqlite:///database.sqlite")
+    )
+    if not app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        return
+
+    pragmas = get_sqlite_pragmas(app)
+    options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+    # In-memory databases use a single static connection, there is no pool to size
+    if not _is_memory(app.config["SQLALCHEMY_DATABASE_URI"]):
+        options = {**DEFAULT_POOL_OPTIONS, **options}
+    options.setdefault("connect_args", {})
+    # pysqlite's own wait, in seconds, matches busy_timeout
+    options["connect_args"].setdefault("timeout", int(pragmas["busy_timeout"]) / 1000)
+    # Pooled connections move between request threads
+    options["connect_args"].setdefault("check_same_thread", False)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+
+def init_engine(app: Flask) -> None:
+    """Applies the SQLite pragmas to every connection, call after db.init_app."""
+    if not app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        return
+    pragmas = get_sqlite_pragmas(app)
+    with app.app_context():
+        event.listen(
+            db.engine,
+            "connect",
+            lambda dbapi_connection, connection_record: set_sqlite_pragmas(dbapi_connection, pragmas),
+        )
+
+
+def _is_memory(uri: str) -> bool:
+    return uri in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in uri
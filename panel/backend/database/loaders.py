@@ -0,0 +1,92 @@
+from typing import Any, Iterable, Iterator
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+
+# Keeps IN (...) lists well below SQLite's bound parameter limit
+IN_CLAUSE_CHUNK_SIZE = 900
+
+
+def chunked(items: list, size: int = IN_CLAUSE_CHUNK_SIZE) -> Iterator[list]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class Loader:
+    """Rows of one model by primary key, batched and memoized.
+
+    prime() only collects ids, the first load() that misses resolves every
+    collected id with one WHERE pk IN (...) query per chunk. Ids without a row
+    are memoized as None, so they are not queried again until the session
+    flushes or commits, which clears every loader of the request.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.column = model.__mapper__.primary_key[0]
+        self._rows: dict[Any, Any] = {}
+        self._pending: set = set()
+
+    def prime(self, ids: Iterable) -> None:
+        self._pending.update(id for id in ids if id is not None and id not in self._rows)
+
+    def load(self, id) -> Any:
+        if id is None:
+            return None
+        if id not in self._rows:
+            self._pending.add(id)
+            self._resolve()
+        return self._rows[id]
+
+    def load_many(self, ids: Iterable) -> list:
+        ids = list(ids)
+        self.prime(ids)
+        self._resolve()
+        return [self._rows.get(id) for id in ids]
+
+    def _resolve(self) -> None:
+        pending = sorted(self._pending)
+        self._pending.clear()
+        for chunk in chunked(pending):
+            for row in self.model.query.filter(self.column.in_(chunk)):
+                self._rows[getattr(row, self.column.key)] = row
+        for id in pending:
+            self._rows.setdefault(id, None)
+
+
+def get_loader(model) -> Loader:
+    """The loader of model for the current request.
+
+    Outside of an app context there is nothing to scope it to, the loader is
+    new and only batches the calls made on it.
+    """
+    if not has_app_context():
+        return Loader(model)
+    loaders = g.setdefault("loaders", {})
+    if model not in loaders:
+        loaders[model] = Loader(model)
+    return loaders[model]
+
+
+def prime(model, ids: Iterable) -> None:
+    get_loader(model).prime(ids)
+
+
+def load(model, id) -> Any:
+    return get_loader(model).load(id)
+
+
+def load_many(model, ids: Iterable) -> list:
+    return get_loader(model).load_many(ids)
+
+
+def clear_loaders() -> None:
+    if has_app_context():
+        g.pop("loaders", None)
+
+
+@event.listens_for(OrmSession, "after_flush")
+@event.listens_for(OrmSession, "after_commit")
+def _clear_written_loaders(session: OrmSession, *args) -> None:
+    # Rows written since would still be memoized as missing or stale
+    clear_loaders()
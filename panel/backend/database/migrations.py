@@ -0,0 +1,175 @@
+from typing import Callable, NamedTuple
+from sqlalchemy.exc import IntegrityError
+from .. import db
+from . import baseline
+from ..utils.logging import log_error, log_info
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable
+
+
+def _baseline(connection) -> None:
+    """The schema ensure_schema used to create at every start, for databases made before migrations.
+
+    Runs the frozen DDL in baseline.py, not the live models, so version 1 means
+    the same schema no matter when it is applied.
+    """
+    for statement in baseline.TABLES:
+        connection.exec_driver_sql(statement)
+    for statement in baseline.INDEXES:
+        try:
+            connection.exec_driver_sql(statement)
+        except IntegrityError as e:
+            # Existing duplicates block a new unique index, the app still works without it
+            log_error(f"Could not create index: {str(e.orig)}")
+    search_exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'UsersSearch'"
+    ).first()
+    for statement in baseline.SEARCH:
+        connection.exec_driver_sql(statement)
+    if not search_exists:
+        connection.exec_driver_sql("INSERT INTO UsersSearch(UsersSearch) VALUES ('rebuild')")
+
+
+# Foreign keys and lookup columns that were scanned, the same indexes are declared
+# on the models for databases created from scratch
+FOREIGN_KEY_INDEXES = (
+    ("UserRoles", "roleId"),
+    ("UserGames", "gameId"),
+    ("Sessions", "userId"),
+    ("Sessions", "gameId"),
+    ("Suspensions", "userId"),
+    ("Suspensions", "suspendedBy"),
+    ("Keys", "gameTypeId"),
+    ("Keys", "gameId"),
+    ("Keys", "createdBy"),
+    ("Keys", "usedBy"),
+    ("DiscountIntents", "discountId"),
+    ("DiscountIntents", "listingId"),
+    ("Subscriptions", "userId"),
+    ("Subscriptions", "listingId"),
+    ("Subscriptions", "endDate"),
+)
+
+
+def _foreign_key_indexes(connection) -> None:
+    for table, column in FOREIGN_KEY_INDEXES:
+        connection.exec_driver_sql(
+            f'CREATE INDEX IF NOT EXISTS "ix_{table}_{column}" ON "{table}" ("{column}")'
+        )
+    connection.exec_driver_sql("ANALYZE")
+
+
+# Every table at migration 3. Writes to them bump TableVersions in the same
+# transaction, from any process, so ETags and caches notice them.
+VERSIONED_TABLES = (
+    "AuthVersions", "DeletedRows", "Discounts", "DiscountIntents", "GameTypes", "Games",
+    "InviteCodes", "Keys", "Listings", "Permissions", "RoleListings", "RolePermissions",
+    "Roles", "SessionLogs", "Sessions", "Settings", "Subscriptions", "Suspensions",
+    "UserGames", "UserRoles", "UserSettings", "Users",
+)
+
+
+def _table_version_triggers(connection) -> None:
+    connection.exec_driver_sql(
+        """CREATE TABLE IF NOT EXISTS TableVersions (
+    tableName VARCHAR(50) NOT NULL PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+)"""
+    )
+    for table in VERSIONED_TABLES:
+        connection.exec_driver_sql(
+            "INSERT OR IGNORE INTO TableVersions (tableName, version) VALUES (?, 0)", (table,)
+        )
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            connection.exec_driver_sql(
+                f'CREATE TRIGGER IF NOT EXISTS "TableVersions_{table}_{operation.lower()}" '
+                f'AFTER {operation} ON "{table}" BEGIN '
+                f"UPDATE TableVersions SET version = version + 1 WHERE tableName = '{table}'; END"
+            )
+
+
+# Append only. A released migration is never edited, changes go into a new one.
+# database.py creates the tables of the current models before migrations run,
+# so on a fresh database a migration finds its change already made and has to
+# skip it, e.g. with IF NOT EXISTS or by checking PRAGMA table_info first.
+MIGRATIONS = (
+    Migration(1, "Baseline schema", _baseline),
+    Migration(2, "Index foreign keys and lookup columns", _foreign_key_indexes),
+    Migration(3, "Count writes per table in TableVersions", _table_version_triggers),
+)
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version() -> int:
+    with db.engine.connect() as connection:
+        return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def apply_migrations() -> list[Migration]:
+    """Brings the database to LATEST_VERSION, returns the migrations applied.
+
+    The version is kept in PRAGMA user_version. Every migration runs in its own
+    BEGIN IMMEDIATE transaction together with the version bump, so a failed
+    migration leaves the previous version intact, and workers starting at the
+    same time wait for each other instead of migrating twice.
+    """
+    applied = []
+    with db.engine.connect() as connection:
+        for migration in MIGRATIONS:
+            # Without this, pysqlite leaves DDL outside of the transaction
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            current = connection.exec_driver_sql("PRAGMA user_version").scalar()
+            if current >= migration.version:
+                connection.rollback()
+                continue
+            try:
+                migration.apply(connection)
+                _set_version(connection, migration.version)
+                connection.commit()
+            except Exception as e:
+                connection.rollback()
+                log_error(f"Migration {migration.version} ({migration.description}) failed: {str(e)}")
+                raise
+            log_info(f"Applied migration {migration.version}: {migration.description}")
+            applied.append(migration)
+    return applied
+
+
+def _set_version(connection, version: int) -> None:
+    # PRAGMA does not take bound parameters
+    connection.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+# Lookups the app runs on every page, EXPLAIN QUERY PLAN should show SEARCH, not SCAN
+HOT_QUERIES = {
+    "Users holding a role": "SELECT userId FROM UserRoles WHERE roleId = 1",
+    "Users owning a game": "SELECT userId FROM UserGames WHERE gameId = 1",
+    "Sessions of a user": "SELECT * FROM Sessions WHERE userId = 1",
+    "Sessions of a game": "SELECT * FROM Sessions WHERE gameId = 1",
+    "Suspensions of a user": "SELECT * FROM Suspensions WHERE userId = 1 AND isActive = 1",
+    "Keys used by a user": "SELECT * FROM Keys WHERE usedBy = 1",
+    "Keys created by a user": "SELECT * FROM Keys WHERE createdBy = 1",
+    "Keys of a game": "SELECT * FROM Keys WHERE gameId = 1",
+    "Listings of a discount": "SELECT listingId FROM DiscountIntents WHERE discountId = 1",
+    "Discounts of a listing": "SELECT discountId FROM DiscountIntents WHERE listingId = 1",
+    "Subscriptions of a user": "SELECT * FROM Subscriptions WHERE userId = 1",
+    "Expiring subscriptions": "SELECT * FROM Subscriptions WHERE endDate < '2025-01-01'",
+}
+
+
+def get_query_plans() -> dict[str, list[str]]:
+    """Returns the EXPLAIN QUERY PLAN lines of every hot query."""
+    with db.engine.connect() as connection:
+        return {
+            name: [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+            for name, sql in HOT_QUERIES.items()
+        }
+
+
+def is_scan(plan: list[str]) -> bool:
+    # "SCAN t USING COVERING INDEX" still walks the whole index
+    return any(line.startswith("SCAN") for line in plan)
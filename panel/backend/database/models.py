@@ -1,14 +1,36 @@
 from .. import db  # Cant be imported from .database because of circular import
 
 # datetime_now_str has to be here because its imported from somewhere else
-from .database import datetime_now, UserStatus, datetime_now_str
-from datetime import datetime
-from typing import Any, Optional
-import bcrypt
+from .database import datetime_now, UserStatus, datetime_now_str, current_datetime
+from datetime import datetime, timedelta
+from typing import Any, Iterable, NamedTuple, Optional
+from collections import defaultdict
+from threading import Lock
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession, joinedload, selectinload
 import os
 import base64
-from io import BytesIO
-from PIL import Image
+from .loaders import chunked, load, load_many, prime
+from ..utils import profile_pictures
+from ..utils.passwords import check_password, hash_password
+from ..utils.table_versions import get_version
+from ..utils.fields import Fields, project, select_fields, subfields, wants
+
+
+def load_related(obj: db.Model, name: str, model, id) -> Any:
+    """The related row, from the relationship when it is loaded, else from the request's loader."""
+    if id is None:
+        return None
+    if name not in inspect(obj).unloaded:
+        return getattr(obj, name)
+    return load(model, id)
+
+
+def prime_related(objects: Iterable[db.Model], name: str, model, key: str) -> None:
+    """Collects the ids of an unloaded relationship, so load_related resolves them in one query."""
+    prime(model, (getattr(obj, key) for obj in objects if name in inspect(obj).unloaded))
+
+
 class Role(db.Model):
     __tablename__ = "Roles"
     roleId = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -16,6 +38,11 @@ class Role(db.Model):
     description = db.Column(db.String(255), nullable=False)
     color = db.Column(db.String(7), nullable=False, unique=True)
 
+    # Read only, links are written through RolePermission
+    permissions = db.relationship(
+        "Permission", secondary="RolePermissions", viewonly=True, order_by="Permission.permissionId"
+    )
+
     @classmethod
     def get_all(cls) -> list["Role"]:
         return Role.query.all()
@@ -187,6 +214,8 @@ class Game(db.Model):
     gameTypeId = db.Column(db.Integer, db.ForeignKey("GameTypes.gameTypeId"))
     color = db.Column(db.String(7), nullable=False, unique=True)
 
+    game_type = db.relationship("GameType", viewonly=True)
+
     @classmethod
     def get_all(cls) -> list["Game"]:
         return Game.query.all()
@@ -208,7 +237,9 @@ class Game(db.Model):
         return Game.query.filter_by(color=color).first()
 
     def to_dict(self) -> dict[str, Any] | None:
-        game_type = GameType.get_by_id(self.gameTypeId)
+        return self._to_dict(load_related(self, "game_type", GameType, self.gameTypeId))
+
+    def _to_dict(self, game_type: "GameType | None") -> dict[str, Any] | None:
         game_type_dict = game_type.to_dict() if game_type is not None else None
 
         return (
@@ -269,13 +300,141 @@ class Settings(db.Model):
         self.currency = currency
 
 
+class CachedRole(NamedTuple):
+    name: str
+    permissions: frozenset[str]
+    # Bit permissionId set for every permission of the role
+    mask: int
+
+
+class RoleSnapshot:
+    """Roles and permissions as read at one set of table versions.
+
+    Every permission owns bit permissionId, ids never change, so masks stay
+    comparable between processes and across restarts, e.g. inside tokens.
+    """
+
+    def __init__(self, roles: dict[int, CachedRole], permissions: dict[str, int]):
+        self.roles = roles
+        self.role_ids = {role.name: roleId for roleId, role in roles.items()}
+        self.permission_ids = permissions
+        self._names = {permissionId: name for name, permissionId in permissions.items()}
+        self._masks: dict[tuple[str, ...], int] = {}
+
+    def permission_mask(self, names: Iterable[str]) -> int:
+        """Mask of the named permissions, unknown names have no bit."""
+        names = tuple(names)
+        mask = self._masks.get(names)
+        if mask is None:
+            mask = 0
+            for name in names:
+                if name in self.permission_ids:
+                    mask |= 1 << self.permission_ids[name]
+            self._masks[names] = mask
+        return mask
+
+    def role_mask(self, roleIds: Iterable[int]) -> int:
+        mask = 0
+        for roleId in roleIds:
+            if roleId in self.roles:
+                mask |= self.roles[roleId].mask
+        return mask
+
+    def permission_names(self, mask: int) -> list[str]:
+        return sorted(
+            name for permissionId, name in self._names.items() if mask >> permissionId & 1
+        )
+
+
+class _RoleCache:
+    """Role and permission lookups for identity loading, cached in-process.
+
+    Entries are tagged with the table versions they were read at and reloaded
+    once a commit touching Roles, Permissions or RolePermissions (UserRoles for
+    the per-user role ids) bumps them. Commits of this process are seen right
+    away, writes of other processes through TableVersions within
+    VERSION_TTL_SECONDS. Versions are read before loading, so a commit landing
+    mid-load only causes another reload, never a stale entry.
+    """
+
+    ROLE_TABLES = ("Roles", "Permissions", "RolePermissions")
+    MAX_USERS = 10_000
+
+    def __init__(self):
+        self._snapshot = RoleSnapshot({}, {})
+        self._snapshot_version: Optional[tuple[str, ...]] = None
+        self._user_roles: dict[int, tuple[int, ...]] = {}
+        self._user_roles_version: Optional[str] = None
+        self._lock = Lock()
+
+    def get_snapshot(self) -> RoleSnapshot:
+        version = tuple(get_version(table) for table in self.ROLE_TABLES)
+        with self._lock:
+            if self._snapshot_version == version:
+                return self._snapshot
+
+        permissions = dict(
+            db.session.execute(db.select(Permission.name, Permission.permissionId)).all()
+        )
+        names, masks = defaultdict(set), defaultdict(int)
+        for roleId, name, permissionId in db.session.execute(
+            db.select(RolePermission.roleId, Permission.name, Permission.permissionId).join(
+                Permission, Permission.permissionId == RolePermission.permissionId
+            )
+        ):
+            names[roleId].add(name)
+            masks[roleId] |= 1 << permissionId
+        snapshot = RoleSnapshot(
+            {
+                roleId: CachedRole(name, frozenset(names[roleId]), masks[roleId])
+                for roleId, name in db.session.execute(db.select(Role.roleId, Role.name))
+            },
+            permissions,
+        )
+
+        with self._lock:
+            self._snapshot, self._snapshot_version = snapshot, version
+        return snapshot
+
+    def get_role_ids(self, userId: int) -> tuple[int, ...]:
+        version = get_version("UserRoles")
+        with self._lock:
+            if self._user_roles_version != version:
+                self._user_roles, self._user_roles_version = {}, version
+            cached = self._user_roles.get(userId)
+        if cached is not None:
+            return cached
+
+        roleIds = tuple(
+            db.session.scalars(db.select(UserRole.roleId).where(UserRole.userId == userId))
+        )
+        with self._lock:
+            if self._user_roles_version == version:
+                if len(self._user_roles) >= self.MAX_USERS:
+                    self._user_roles.clear()
+                self._user_roles[userId] = roleIds
+        return roleIds
+
+
+role_cache = _RoleCache()
+
+
 class UserIdentity:
-    def __init__(self, userId: int, username: str, email: str, roles: list[str], permissions: list[str]):
+    def __init__(
+        self,
+        userId: int,
+        username: str,
+        email: str,
+        roles: list[str],
+        permissions: list[str],
+        permission_mask: int = 0,
+    ):
         self.userId = userId
         self.username = username
         self.email = email
         self.roles = roles
         self.permissions = permissions
+        self.permission_mask = permission_mask
 
     def to_dict(self) -> dict[str, Any]:
         return {
@@ -286,26 +445,55 @@ class UserIdentity:
             "permissions": self.permissions
         }
 
+    def has_any_permission(self, names: Iterable[str]) -> bool:
+        return bool(self.permission_mask & role_cache.get_snapshot().permission_mask(names))
+
     @classmethod
     def from_user(cls, user: "User") -> "UserIdentity":
-        # Fetch role names (strings)
-        roles = [role['name'] for role in user.get_roles()]
-        permissions = cls.get_permissions_from_roles(roles)  # Pass role names to the method
-        return cls(user.userId, user.username, user.email, roles, permissions)
+        # At most one query for the user's role ids, none while they are cached
+        snapshot = role_cache.get_snapshot()
+        roleIds = [roleId for roleId in role_cache.get_role_ids(user.userId) if roleId in snapshot.roles]
+        mask = snapshot.role_mask(roleIds)
+        return cls(
+            user.userId,
+            user.username,
+            user.email,
+            [snapshot.roles[roleId].name for roleId in roleIds],
+            snapshot.permission_names(mask),
+            mask,
+        )
+
+    @classmethod
+    def from_claims(cls, userId: int, claims: dict[str, Any]) -> "UserIdentity":
+        """Builds the identity from the claims of a token issued with authorization_claims."""
+        snapshot = role_cache.get_snapshot()
+        return cls(
+            userId,
+            claims["name"],
+            claims["email"],
+            [snapshot.roles[roleId].name for roleId in claims["roles"] if roleId in snapshot.roles],
+            snapshot.permission_names(claims["perms"]),
+            claims["perms"],
+        )
+
+    def authorization_claims(self, version: int) -> dict[str, Any]:
+        roleIds = role_cache.get_snapshot().role_ids
+        return {
+            "authv": version,
+            "name": self.username,
+            "email": self.email,
+            "roles": [roleIds[name] for name in self.roles if name in roleIds],
+            "perms": self.permission_mask,
+        }
 
     @staticmethod
     def get_permissions_from_roles(role_names: list[str]) -> list[str]:
-        permissions = []
-        for role_name in role_names:
-            role = Role.get_by_name(role_name)
-            if role:
-                # Get all permissions linked to this role
-                role_permissions = RolePermission.get_all_by_role_id(role.roleId)
-                for rp in role_permissions:
-                    permission = Permission.get_by_id(rp.permissionId)
-                    if permission:
-                        permissions.append(permission.name)
-        return permissions
+        snapshot = role_cache.get_snapshot()
+        return snapshot.permission_names(
+            snapshot.role_mask(
+                snapshot.role_ids[name] for name in role_names if name in snapshot.role_ids
+            )
+        )
 
 class User(db.Model):
     __tablename__ = "Users"
@@ -319,10 +507,34 @@ class User(db.Model):
     subscriptionStart = db.Column(db.DateTime)
     subscriptionEnd = db.Column(db.DateTime)
     lastLogin = db.Column(db.DateTime)
-    lastEdit = db.Column(db.DateTime, nullable=False, default=lambda: datetime_now)
+    lastEdit = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=current_datetime,
+        onupdate=current_datetime,
+        index=True,
+    )
     lastIP = db.Column(db.String(50), nullable=False)
     status = db.Column(db.String(50), nullable=False, default=UserStatus.Inactive.value)
 
+    __field_columns__ = {"subscription": ("subscriptionStart", "subscriptionEnd")}
+
+    # Empty HWIDs are common, only real ones have to be unique
+    __table_args__ = (
+        db.Index(
+            "ux_Users_HWID",
+            "HWID",
+            unique=True,
+            sqlite_where=db.text("HWID IS NOT NULL AND HWID != ''"),
+        ),
+    )
+
+    UNIQUE_FIELDS = ("username", "email", "HWID")
+
+    # Read only, links are written through UserRole and UserGame in bulk
+    roles = db.relationship("Role", secondary="UserRoles", viewonly=True, order_by="Role.roleId")
+    games = db.relationship("Game", secondary="UserGames", viewonly=True, order_by="Game.gameId")
+
     @classmethod
     def get_all(cls) -> list["User"]:
         return User.query.all()
@@ -380,6 +592,48 @@ class User(db.Model):
             is not None
         )
 
+    @classmethod
+    def find_conflicts(
+        cls,
+        username: Optional[str] = None,
+        email: Optional[str] = None,
+        HWID: Optional[str] = None,
+        exceptId: Optional[int] = None,
+    ) -> list[str]:
+        """Returns which of the given unique fields are taken by another user, in one query."""
+        values = {"username": username, "email": email, "HWID": HWID}
+        conditions = [getattr(cls, field) == value for field, value in values.items() if value]
+        if not conditions:
+            return []
+
+        query = db.select(cls.username, cls.email, cls.HWID).where(db.or_(*conditions))
+        if exceptId is not None:
+            query = query.where(cls.userId != exceptId)
+
+        conflicts = set()
+        for row in db.session.execute(query):
+            for field, value in values.items():
+                if value and getattr(row, field) == value:
+                    conflicts.add(field)
+        return [field for field in cls.UNIQUE_FIELDS if field in conflicts]
+
+    @classmethod
+    def conflicts_from_error(cls, error: Exception) -> list[str]:
+        """Maps a unique constraint violation on Users back to the offending fields.
+
+        SQLite reports these as "UNIQUE constraint failed: Users.username".
+        """
+        message = str(getattr(error, "orig", error))
+        prefix = "UNIQUE constraint failed: "
+        if not message.startswith(prefix):
+            return []
+        columns = [column.strip() for column in message[len(prefix) :].split(",")]
+        return [
+            field
+            for field in cls.UNIQUE_FIELDS
+            if f"{cls.__tablename__}.{field}" in columns
+        ]
+
     @classmethod
     def get_profile_picture(cls, userId: int) -> str | None:
         try:
@@ -396,112 +650,197 @@ class User(db.Model):
             return None
 
     @classmethod
-     
     def edit_profile_picture(cls, userId: int, picture: str) -> None:
         try:
-            picture_data = base64.b64decode(picture.split(",")[1])
-
-            image = Image.open(BytesIO(picture_data))
-
-            max_size_in_bytes = 2 * 1024 * 1024  # 2MB
-            if len(picture_data) > max_size_in_bytes:
-                raise ValueError("Image size exceeds the limit of 2MB.")
-
-            output = BytesIO()
-            image.save(output, format="WEBP")
-            webp_data = output.getvalue()
-
-            with open(f"./profile_pictures/{userId}.webp", "wb") as f:
-                f.write(webp_data)
+            profile_pictures.submit(userId, cls._decode_picture(picture))
         except Exception as e:
             print(f"Error editing profile picture for user {userId}: {e}")
 
     @classmethod
     def delete_profile_picture(cls, userId: int) -> None:
-        os.remove(f"./profile_pictures/{userId}.webp")
+        profile_pictures.delete(userId)
 
     @classmethod
     def add_profile_picture(cls, userId: int, picture: str) -> None:
         try:
-            picture_data = base64.b64decode(picture.split(",")[1])
-            image = Image.open(BytesIO(picture_data))
-
-            max_size_in_bytes = 2 * 1024 * 1024  # 2MB
-
-            if len(picture_data) > max_size_in_bytes:
-                raise ValueError("Image size exceeds the limit of 2MB.")
-
-            output = BytesIO()
-            image.save(output, format="WEBP")
-            webp_data = output.getvalue()
-
-            with open(f"./profile_pictures/{userId}.webp", "wb") as f:
-                f.write(webp_data)
+            profile_pictures.submit(userId, cls._decode_picture(picture))
         except Exception as e:
             print(f"Error adding profile picture for user {userId}: {e}")
             raise
 
+    @staticmethod
+    def _decode_picture(picture: str) -> bytes:
+        encoded = picture.split(",")[1]
+        # Base64 is 4 characters per 3 bytes, reject before decoding anything
+        if len(encoded) * 3 // 4 > profile_pictures.MAX_PICTURE_BYTES:
+            raise ValueError("Image size exceeds the limit of 2MB.")
+        return base64.b64decode(encoded)
+
     def to_identity(self) -> "UserIdentity":
         return UserIdentity.from_user(self)
 
     def check_password(self, password: str) -> bool:
-        return bcrypt.checkpw(password.encode("utf-8"), self.password.encode("utf-8"))
+        return check_password(password, self.password)
 
     def get_roles(self):
-        user_roles = UserRole.get_by_userId(self.userId)
-        roles_info = []
-
-        for user_role in user_roles:
-            role = Role.get_by_id(user_role.roleId)
-            if role:
-                roles_info.append(role.to_dict())
-        return roles_info
+        return [role.to_dict() for role in self.roles]
 
     def get_games(self):
-        user_games = UserGame.query.filter_by(userId=self.userId).all()
-        games_info = []
+        return [game.to_dict() for game in self.games]
+
+    @classmethod
+    def loader_options(cls, fields: Fields = None) -> list:
+        """Eager loads what to_dict reads for the selected fields, one query per collection."""
+        options = []
+        if wants(fields, "roles"):
+            options.append(selectinload(cls.roles))
+        if wants(fields, "games"):
+            options.append(selectinload(cls.games).joinedload(Game.game_type))
+        return options
+
+    @classmethod
+    def to_dict_batch(
+        cls, users: Iterable["User"], fields: Fields = None
+    ) -> list[dict[str, Any]]:
+        """Serializes many users at once, same output as calling to_dict on each.
+
+        Roles, games and game types are resolved with a fixed number of queries
+        per chunk of users instead of several queries per user, and only when
+        they are among the selected fields.
+        """
+        users = list(users)
+        user_ids = [user.userId for user in users]
+
+        role_ids_by_user = defaultdict(list)
+        game_ids_by_user = defaultdict(list)
+        for chunk in chunked(user_ids):
+            if wants(fields, "roles"):
+                for user_role in UserRole.query.filter(UserRole.userId.in_(chunk)):
+                    role_ids_by_user[user_role.userId].append(user_role.roleId)
+            if wants(fields, "games"):
+                for user_game in UserGame.query.filter(UserGame.userId.in_(chunk)):
+                    game_ids_by_user[user_game.userId].append(user_game.gameId)
+
+        # Through the request's loaders, rows already loaded by an earlier batch are reused
+        role_ids = list({id for ids in role_ids_by_user.values() for id in ids})
+        game_ids = list({id for ids in game_ids_by_user.values() for id in ids})
+        roles = {
+            role.roleId: project(role.to_dict(), subfields(fields, "roles"))
+            for role in load_many(Role, role_ids)
+            if role is not None
+        }
+        games = [game for game in load_many(Game, game_ids) if game is not None]
+        prime(GameType, (game.gameTypeId for game in games))
+        games = {
+            game.gameId: project(
+                game._to_dict(load(GameType, game.gameTypeId)),
+                subfields(fields, "games"),
+            )
+            for game in games
+        }
 
-        for user_game in user_games:
-            game = Game.get_by_id(user_game.gameId)
-            if game:
-                games_info.append(game.to_dict())
-        return games_info
+        # One directory listing instead of a stat per user
+        pictures = (
+            profile_pictures.list_pictures()
+            if wants(fields, "profilePicture") or wants(fields, "profilePictureRenditions")
+            else {}
+        )
 
-    def to_dict(self) -> dict[str, Any]:
-        return {
-            "userId": self.userId,
-            "username": self.username,
-            "email": self.email,
-            "password": self.password,
-            "HWID": self.HWID,
-            "registerDate": (
-                self.registerDate.isoformat() if self.registerDate else None
+        return [
+            user._to_dict(
+                roles=[
+                    roles[roleId]
+                    for roleId in role_ids_by_user[user.userId]
+                    if roleId in roles
+                ],
+                games=[
+                    games[gameId]
+                    for gameId in game_ids_by_user[user.userId]
+                    if gameId in games
+                ],
+                picture_version=(
+                    profile_pictures.get_version(user.userId, pictures[user.userId])
+                    if user.userId in pictures
+                    else None
+                ),
+                fields=fields,
+            )
+            for user in users
+        ]
+
+    def to_dict(self, fields: Fields = None) -> dict[str, Any]:
+        return self._to_dict(
+            roles=(
+                project(self.get_roles(), subfields(fields, "roles"))
+                if wants(fields, "roles")
+                else []
             ),
-            "registerIP": self.registerIP,
-            "subscription": (
-                {
-                    "start": (
-                        self.subscriptionStart.isoformat()
-                        if self.subscriptionStart
-                        else None
-                    ),
-                    "end": (
-                        self.subscriptionEnd.isoformat()
-                        if self.subscriptionEnd
-                        else None
-                    ),
-                }
-                if self.subscriptionStart or self.subscriptionEnd
+            games=(
+                project(self.get_games(), subfields(fields, "games"))
+                if wants(fields, "games")
+                else []
+            ),
+            picture_version=(
+                profile_pictures.get_version(self.userId)
+                if wants(fields, "profilePicture") or wants(fields, "profilePictureRenditions")
                 else None
             ),
-            "lastLogin": self.lastLogin.isoformat() if self.lastLogin else None,
-            "lastEdit": self.lastEdit.isoformat() if self.lastEdit else None,
-            "lastIP": self.lastIP,
-            "status": self.status,
-            "roles": self.get_roles(),
-            "games": self.get_games(),
-            "profilePicture": User.get_profile_picture(self.userId),
-        }
+            fields=fields,
+        )
+
+    def _to_dict(
+        self,
+        roles: list[dict[str, Any]],
+        games: list[dict[str, Any] | None],
+        picture_version: str | None,
+        fields: Fields = None,
+    ) -> dict[str, Any]:
+        return select_fields(
+            fields,
+            {
+                "userId": lambda: self.userId,
+                "username": lambda: self.username,
+                "email": lambda: self.email,
+                "password": lambda: self.password,
+                "HWID": lambda: self.HWID,
+                "registerDate": lambda: (
+                    self.registerDate.isoformat() if self.registerDate else None
+                ),
+                "registerIP": lambda: self.registerIP,
+                "subscription": lambda: project(
+                    (
+                        {
+                            "start": (
+                                self.subscriptionStart.isoformat()
+                                if self.subscriptionStart
+                                else None
+                            ),
+                            "end": (
+                                self.subscriptionEnd.isoformat()
+                                if self.subscriptionEnd
+                                else None
+                            ),
+                        }
+                        if self.subscriptionStart or self.subscriptionEnd
+                        else None
+                    ),
+                    subfields(fields, "subscription"),
+                ),
+                "lastLogin": lambda: (
+                    self.lastLogin.isoformat() if self.lastLogin else None
+                ),
+                "lastEdit": lambda: self.lastEdit.isoformat() if self.lastEdit else None,
+                "lastIP": lambda: self.lastIP,
+                "status": lambda: self.status,
+                "roles": lambda: roles,
+                "games": lambda: games,
+                "profilePicture": lambda: profile_pictures.get_url(self.userId, picture_version),
+                # Small sizes for lists and avatars, keyed by edge length in pixels
+                "profilePictureRenditions": lambda: profile_pictures.get_rendition_urls(
+                    self.userId, picture_version
+                ),
+            },
+        )
 
     def __init__(
         self,
@@ -522,9 +861,7 @@ class User(db.Model):
             self.userId = userId
         self.username = username
         self.email = email
-        self.password = bcrypt.hashpw(
-            password.encode("utf-8"), bcrypt.gensalt()
-        ).decode("utf-8")
+        self.password = hash_password(password)
         self.HWID = HWID
         self.registerDate = registerDate if registerDate else datetime_now
         self.registerIP = registerIP
@@ -534,28 +871,42 @@ class User(db.Model):
         self.lastLogin = lastLogin
         self.lastIP = lastIP
 
-        db.session.add(self)
-        db.session.commit()
-
-        member_role = Role.get_by_name("Member")
-        if member_role:
-            user_roles = UserRole(self.userId, member_role.roleId)
-            db.session.add(user_roles)
-            db.session.commit()
+    @classmethod
+    def create(
+        cls,
+        roleIds: Iterable[int] = (),
+        gameIds: Iterable[int] = (),
+        **kwargs: Any,
+    ) -> "User":
+        """Adds a user with the Member role, its settings, roles and games to the session.
 
+        Flushes once to get the generated ids and does not commit, so the caller
+        commits the whole user in one transaction.
+        """
+        user = cls(**kwargs)
         settings = Settings()
-        db.session.add(settings)
-        db.session.commit()
+        db.session.add_all([user, settings])
+        db.session.flush()
 
-        user_settings = UserSettings(self.userId, settings.settingsId)
-        db.session.add(user_settings)
-        db.session.commit()
+        db.session.execute(
+            db.insert(UserSettings).values(
+                userId=user.userId, settingsId=settings.settingsId
+            )
+        )
+
+        role_ids = set(roleIds)
+        member_role = Role.get_by_name("Member")
+        if member_role:
+            role_ids.add(member_role.roleId)
+        UserRole.insert_for_user(user.userId, role_ids)
+        UserGame.insert_for_user(user.userId, set(gameIds))
+        return user
 
 
 class UserRole(db.Model):
     __tablename__ = "UserRoles"
     userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), primary_key=True)
-    roleId = db.Column(db.Integer, db.ForeignKey("Roles.roleId"), primary_key=True)
+    roleId = db.Column(db.Integer, db.ForeignKey("Roles.roleId"), primary_key=True, index=True)
 
     @classmethod
     def get_by_id(cls, userId: int, roleId: int) -> "UserRole | None":
@@ -577,6 +928,25 @@ class UserRole(db.Model):
     def delete(cls, userId: int, roleId: int) -> None:
         UserRole.query.filter_by(userId=userId, roleId=roleId).delete()
 
+    @classmethod
+    def insert_for_user(cls, userId: int, roleIds: Iterable[int]) -> None:
+        rows = [{"userId": userId, "roleId": roleId} for roleId in roleIds]
+        if rows:
+            db.session.execute(db.insert(cls), rows)
+
+    @classmethod
+    def set_for_user(cls, userId: int, roleIds: Iterable[int]) -> None:
+        """Replaces the user's roles with one DELETE and one INSERT for the difference."""
+        wanted = set(roleIds)
+        existing = set(db.session.scalars(db.select(cls.roleId).filter_by(userId=userId)))
+        if existing - wanted:
+            db.session.execute(
+                db.delete(cls).where(
+                    cls.userId == userId, cls.roleId.in_(existing - wanted)
+                )
+            )
+        cls.insert_for_user(userId, wanted - existing)
+
     def __init__(self, userId: int, roleId: int):
         self.userId = userId
         self.roleId = roleId
@@ -585,7 +955,7 @@ class UserRole(db.Model):
 class UserGame(db.Model):
     __tablename__ = "UserGames"
     userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), primary_key=True)
-    gameId = db.Column(db.Integer, db.ForeignKey("Games.gameId"), primary_key=True)
+    gameId = db.Column(db.Integer, db.ForeignKey("Games.gameId"), primary_key=True, index=True)
 
     @classmethod
     def get_by_userId(cls, userId: int) -> list["UserGame"]:
@@ -603,6 +973,25 @@ class UserGame(db.Model):
     def delete(cls, userId: int, gameId: int) -> None:
         UserGame.query.filter_by(userId=userId, gameId=gameId).delete()
 
+    @classmethod
+    def insert_for_user(cls, userId: int, gameIds: Iterable[int]) -> None:
+        rows = [{"userId": userId, "gameId": gameId} for gameId in gameIds]
+        if rows:
+            db.session.execute(db.insert(cls), rows)
+
+    @classmethod
+    def set_for_user(cls, userId: int, gameIds: Iterable[int]) -> None:
+        """Replaces the user's games with one DELETE and one INSERT for the difference."""
+        wanted = set(gameIds)
+        existing = set(db.session.scalars(db.select(cls.gameId).filter_by(userId=userId)))
+        if existing - wanted:
+            db.session.execute(
+                db.delete(cls).where(
+                    cls.userId == userId, cls.gameId.in_(existing - wanted)
+                )
+            )
+        cls.insert_for_user(userId, wanted - existing)
+
     def __init__(self, userId: int, gameId: int):
         self.userId = userId
         self.gameId = gameId
@@ -631,11 +1020,16 @@ class UserSettings(db.Model):
 class Session(db.Model):
     __tablename__ = "Sessions"
     sessionId = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False)
-    gameId = db.Column(db.Integer, db.ForeignKey("Games.gameId"), nullable=False)
+    userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False, index=True)
+    gameId = db.Column(db.Integer, db.ForeignKey("Games.gameId"), nullable=False, index=True)
     status = db.Column(db.String(50), nullable=False)  # TODO: Change it to Enum
     createdAt = db.Column(db.DateTime, default=lambda: datetime_now)
 
+    __field_columns__ = {"user": ("userId",), "game": ("gameId",)}
+
+    user = db.relationship("User", viewonly=True)
+    game = db.relationship("Game", viewonly=True)
+
     @classmethod
     def get_all(cls) -> list["Session"]:
         return Session.query.all()
@@ -644,19 +1038,45 @@ class Session(db.Model):
     def get_by_id(cls, sessionId: int) -> "Session | None":
         return Session.query.get(sessionId)
 
-    def to_dict(self) -> dict[str, Any]:
-        user = User.get_by_id(self.userId)
-        user_dict = user.to_dict() if user is not None else None
-        game = Game.get_by_id(self.gameId)
-        game_dict = game.to_dict() if game is not None else None
+    @classmethod
+    def loader_options(cls, fields: Fields = None) -> list:
+        options = []
+        if wants(fields, "user"):
+            options.append(
+                selectinload(cls.user).options(*User.loader_options(subfields(fields, "user")))
+            )
+        if wants(fields, "game"):
+            options.append(joinedload(cls.game).joinedload(Game.game_type))
+        return options
 
-        return {
-            "sessionId": self.sessionId,
-            "user": user_dict,
-            "game": game_dict,
-            "status": self.status,
-            "createdAt": self.createdAt.isoformat() if self.createdAt else None,
-        }
+    def to_dict(self, fields: Fields = None) -> dict[str, Any]:
+        user_dict = None
+        game_dict = None
+
+        if wants(fields, "user"):
+            user = load_related(self, "user", User, self.userId)
+            user_dict = user.to_dict(subfields(fields, "user")) if user is not None else None
+
+        if wants(fields, "game"):
+            game = load_related(self, "game", Game, self.gameId)
+            game_dict = (
+                project(game.to_dict(), subfields(fields, "game"))
+                if game is not None
+                else None
+            )
+
+        return select_fields(
+            fields,
+            {
+                "sessionId": lambda: self.sessionId,
+                "user": lambda: user_dict,
+                "game": lambda: game_dict,
+                "status": lambda: self.status,
+                "createdAt": lambda: (
+                    self.createdAt.isoformat() if self.createdAt else None
+                ),
+            },
+        )
 
     def __init__(self, userId: int, gameId: int, status: str):
         self.userId = userId
@@ -690,17 +1110,27 @@ typedef enum {
 class Suspension(db.Model): # TODO: pridat security report type
     __tablename__ = "Suspensions"
     suspensionId = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False)
+    userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False, index=True)
     reason = db.Column(db.String(200), nullable=False)
     HWID = db.Column(db.String(200))
     status = db.Column(db.String(50), nullable=False)  # TODO: Change it to Enum
-    suspendedBy = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False)
+    suspendedBy = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False, index=True)
     suspensionStart = db.Column(
         db.DateTime, nullable=False, default=lambda: datetime_now
     )
     suspensionEnd = db.Column(db.DateTime)
     isActive = db.Column(db.Boolean, nullable=False, default=True)
-    lastEdit = db.Column(db.DateTime, default=lambda: datetime_now)
+    lastEdit = db.Column(
+        db.DateTime, default=current_datetime, onupdate=current_datetime, index=True
+    )
+
+    __field_columns__ = {
+        "user": ("userId",),
+        "suspension": ("suspensionStart", "suspensionEnd"),
+    }
+
+    user = db.relationship("User", foreign_keys=[userId], viewonly=True)
+    suspended_by_user = db.relationship("User", foreign_keys=[suspendedBy], viewonly=True)
 
     @classmethod
     def get_all(cls) -> list["Suspension"]:
@@ -714,29 +1144,68 @@ class Suspension(db.Model): # TODO: pridat security report type
     def get_by_userId(cls, userId: int) -> "Suspension | None":
         return Suspension.query.filter_by(userId=userId).first()
 
-    def to_dict(self) -> dict[str, Any]:
-        user = User.get_by_id(self.userId)
-        user_dict = user.to_dict() if user is not None else None
-
-        suspended_by = User.get_by_id(self.suspendedBy)
-        suspended_by_dict = suspended_by.to_dict() if suspended_by is not None else None
+    @classmethod
+    def loader_options(cls, fields: Fields = None) -> list:
+        options = []
+        if wants(fields, "user"):
+            options.append(
+                selectinload(cls.user).options(*User.loader_options(subfields(fields, "user")))
+            )
+        if wants(fields, "suspendedBy"):
+            options.append(
+                selectinload(cls.suspended_by_user).options(
+                    *User.loader_options(subfields(fields, "suspendedBy"))
+                )
+            )
+        return options
+
+    def to_dict(self, fields: Fields = None) -> dict[str, Any]:
+        # The user and the suspender come back in one query when neither is loaded
+        if wants(fields, "user"):
+            prime_related([self], "user", User, "userId")
+        if wants(fields, "suspendedBy"):
+            prime_related([self], "suspended_by_user", User, "suspendedBy")
+        user_dict = None
+        suspended_by_dict = None
+
+        if wants(fields, "user"):
+            user = load_related(self, "user", User, self.userId)
+            user_dict = user.to_dict(subfields(fields, "user")) if user is not None else None
+
+        if wants(fields, "suspendedBy"):
+            suspended_by = load_related(self, "suspended_by_user", User, self.suspendedBy)
+            suspended_by_dict = (
+                suspended_by.to_dict(subfields(fields, "suspendedBy"))
+                if suspended_by is not None
+                else None
+            )
 
-        return {
-            "suspensionId": self.suspensionId,
-            "user": user_dict,
-            "status": self.status,
-            "reason": self.reason,
-            "HWID": self.HWID,
-            "suspendedBy": suspended_by_dict,
-            "suspension": {
-                "start": (
-                    self.suspensionStart.isoformat() if self.suspensionStart else None
+        return select_fields(
+            fields,
+            {
+                "suspensionId": lambda: self.suspensionId,
+                "user": lambda: user_dict,
+                "status": lambda: self.status,
+                "reason": lambda: self.reason,
+                "HWID": lambda: self.HWID,
+                "suspendedBy": lambda: suspended_by_dict,
+                "suspension": lambda: project(
+                    {
+                        "start": (
+                            self.suspensionStart.isoformat()
+                            if self.suspensionStart
+                            else None
+                        ),
+                        "end": (
+                            self.suspensionEnd.isoformat() if self.suspensionEnd else None
+                        ),
+                    },
+                    subfields(fields, "suspension"),
                 ),
-                "end": self.suspensionEnd.isoformat() if self.suspensionEnd else None,
+                "isActive": lambda: self.isActive,
+                "lastEdit": lambda: self.lastEdit.isoformat() if self.lastEdit else None,
             },
-            "isActive": self.isActive,
-            "lastEdit": self.lastEdit.isoformat() if self.lastEdit else None,
-        }
+        )
 
     def __init__(
         self,
@@ -760,7 +1229,81 @@ class Suspension(db.Model): # TODO: pridat security report type
         self.suspensionStart = suspensionStart if suspensionStart else datetime_now
         self.suspensionEnd = suspensionEnd
         self.isActive = isActive
-        self.lastEdit = datetime_now
+        self.lastEdit = current_datetime()
+
+
+# Tombstones older than this are pruned, clients whose watermark is older get a full resync
+DELETED_ROW_RETENTION = timedelta(days=30)
+
+
+class DeletedRow(db.Model):
+    """Tombstones for rows of synced tables, so delta sync can report deletes."""
+
+    __tablename__ = "DeletedRows"
+    deletedRowId = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    tableName = db.Column(db.String(50), nullable=False)
+    rowId = db.Column(db.Integer, nullable=False)
+    deletedAt = db.Column(db.DateTime, nullable=False, default=current_datetime)
+
+    __table_args__ = (db.Index("ix_DeletedRows_tableName_deletedAt", "tableName", "deletedAt"),)
+
+    @classmethod
+    def get_ids_since(cls, tableName: str, since: datetime) -> list[int]:
+        return [
+            row.rowId
+            for row in cls.query.filter(
+                cls.tableName == tableName, cls.deletedAt >= since
+            ).all()
+        ]
+
+    def __init__(self, tableName: str, rowId: int):
+        self.tableName = tableName
+        self.rowId = rowId
+        self.deletedAt = current_datetime()
+
+
+# Tables whose deletes are recorded in DeletedRows, mapped to their primary key
+SYNCED_MODELS = {
+    "Users": "userId",
+    "Suspensions": "suspensionId",
+}
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _record_deleted_rows(session: OrmSession, flush_context, instances) -> None:
+    # Only covers session.delete(); Query.delete() on a synced table would bypass it
+    tables = set()
+    for obj in list(session.deleted):
+        key = SYNCED_MODELS.get(getattr(obj, "__tablename__", None))
+        if key is not None:
+            session.add(DeletedRow(obj.__tablename__, getattr(obj, key)))
+            tables.add(obj.__tablename__)
+
+    # Pruned as new ones are written, so the log stays bounded without a scheduled job
+    cutoff = current_datetime().replace(tzinfo=None) - DELETED_ROW_RETENTION
+    for table in tables:
+        session.execute(
+            db.delete(DeletedRow).where(
+                DeletedRow.tableName == table, DeletedRow.deletedAt < cutoff
+            ),
+            execution_options={"synchronize_session": False},
+        )
+
+
+class AuthVersion(db.Model):
+    """Per-user authorization version, embedded in tokens that carry role claims.
+
+    Bumped whenever the user's roles, status or the permissions of their roles
+    change. Rows outlive their user, so tokens of deleted users stay stale.
+    """
+
+    __tablename__ = "AuthVersions"
+    userId = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def get_version(cls, userId: int) -> int:
+        return db.session.scalar(db.select(cls.version).filter_by(userId=userId)) or 0
 
 
 class InviteCode(db.Model):
@@ -795,14 +1338,21 @@ class Key(db.Model):
     __tablename__ = "Keys"
     keyId = db.Column(db.Integer, primary_key=True, autoincrement=True)
     key = db.Column(db.String(200), nullable=False, unique=True)
-    gameTypeId = db.Column(db.Integer, db.ForeignKey("GameTypes.gameTypeId"))
-    gameId = db.Column(db.Integer, db.ForeignKey("Games.gameId"))
-    createdBy = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False)
-    usedBy = db.Column(db.Integer, db.ForeignKey("Users.userId"))
+    gameTypeId = db.Column(db.Integer, db.ForeignKey("GameTypes.gameTypeId"), index=True)
+    gameId = db.Column(db.Integer, db.ForeignKey("Games.gameId"), index=True)
+    createdBy = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False, index=True)
+    usedBy = db.Column(db.Integer, db.ForeignKey("Users.userId"), index=True)
     createdAt = db.Column(db.DateTime, nullable=False, default=lambda: datetime_now)
     usedAt = db.Column(db.DateTime)
     isUsed = db.Column(db.Boolean, default=False)
 
+    __field_columns__ = {"gameType": ("gameTypeId",), "game": ("gameId",)}
+
+    game_type = db.relationship("GameType", viewonly=True)
+    game = db.relationship("Game", viewonly=True)
+    created_by_user = db.relationship("User", foreign_keys=[createdBy], viewonly=True)
+    used_by_user = db.relationship("User", foreign_keys=[usedBy], viewonly=True)
+
     @classmethod
     def get_all(cls) -> list["Key"]:
         return Key.query.all()
@@ -824,39 +1374,73 @@ class Key(db.Model):
         self.usedAt = datetime_now
         self.isUsed = True
 
-    def to_dict(self) -> dict[str, Any]:
+    @classmethod
+    def loader_options(cls, fields: Fields = None) -> list:
+        # Lookup tables are joined, users come with collections and are selected
+        options = []
+        if wants(fields, "gameType"):
+            options.append(joinedload(cls.game_type))
+        if wants(fields, "game"):
+            options.append(joinedload(cls.game).joinedload(Game.game_type))
+        for name, relationship in (
+            ("createdBy", cls.created_by_user),
+            ("usedBy", cls.used_by_user),
+        ):
+            if wants(fields, name):
+                options.append(
+                    selectinload(relationship).options(*User.loader_options(subfields(fields, name)))
+                )
+        return options
+
+    def to_dict(self, fields: Fields = None) -> dict[str, Any]:
+        # The creator and the user come back in one query when neither is loaded
+        if wants(fields, "createdBy"):
+            prime_related([self], "created_by_user", User, "createdBy")
+        if wants(fields, "usedBy"):
+            prime_related([self], "used_by_user", User, "usedBy")
         game_type_dict = None
         game_dict = None
         created_by_dict = None
         used_by_dict = None
 
-        if self.gameTypeId is not None:
-            game_type = GameType.get_by_id(self.gameTypeId)
-            game_type_dict = game_type.to_dict() if game_type else None
+        if wants(fields, "gameType") and self.gameTypeId is not None:
+            game_type = load_related(self, "game_type", GameType, self.gameTypeId)
+            game_type_dict = (
+                project(game_type.to_dict(), subfields(fields, "gameType"))
+                if game_type
+                else None
+            )
 
-        if self.gameId is not None:
-            game = Game.get_by_id(self.gameId)
-            game_dict = game.to_dict() if game else None
+        if wants(fields, "game") and self.gameId is not None:
+            game = load_related(self, "game", Game, self.gameId)
+            game_dict = project(game.to_dict(), subfields(fields, "game")) if game else None
 
-        if self.createdBy is not None:
-            created_by = User.get_by_id(self.createdBy)
-            created_by_dict = created_by.to_dict() if created_by else None
+        if wants(fields, "createdBy") and self.createdBy is not None:
+            created_by = load_related(self, "created_by_user", User, self.createdBy)
+            created_by_dict = (
+                created_by.to_dict(subfields(fields, "createdBy")) if created_by else None
+            )
 
-        if self.usedBy is not None:
-            used_by = User.get_by_id(self.usedBy)
-            used_by_dict = used_by.to_dict() if used_by else None
+        if wants(fields, "usedBy") and self.usedBy is not None:
+            used_by = load_related(self, "used_by_user", User, self.usedBy)
+            used_by_dict = used_by.to_dict(subfields(fields, "usedBy")) if used_by else None
 
-        return {
-            "keyId": self.keyId,
-            "key": self.key,
-            "gameType": game_type_dict,
-            "game": game_dict,
-            "createdBy": created_by_dict,
-            "usedBy": used_by_dict,
-            "createdAt": self.createdAt.isoformat() if self.createdAt else None,
-            "usedAt": self.usedAt.isoformat() if self.usedAt else None,
-            "isUsed": self.isUsed,
-        }
+        return select_fields(
+            fields,
+            {
+                "keyId": lambda: self.keyId,
+                "key": lambda: self.key,
+                "gameType": lambda: game_type_dict,
+                "game": lambda: game_dict,
+                "createdBy": lambda: created_by_dict,
+                "usedBy": lambda: used_by_dict,
+                "createdAt": lambda: (
+                    self.createdAt.isoformat() if self.createdAt else None
+                ),
+                "usedAt": lambda: self.usedAt.isoformat() if self.usedAt else None,
+                "isUsed": lambda: self.isUsed,
+            },
+        )
 
     def __init__(
         self,
@@ -898,19 +1482,30 @@ class Listing(db.Model):
 
     discount = db.relationship("Discount", back_populates="listings")
 
-    def to_dict(self) -> dict[str, Any]:
-        return {
-            "listingId": self.listingId,
-            "name": self.name,
-            "description": self.description,
-            "gameId": self.gameId,
-            "price": self.price,
-            "copies": self.copies,
-            "sold": self.sold,
-            "isActive": self.isActive,
-            "discount": self.discount.to_dict() if self.discount else None,
-            "intendedDiscounts": [intent.discountId for intent in self.intended_discounts],
-        }
+    __field_columns__ = {"discount": ("discountId",)}
+
+    def to_dict(self, fields: Fields = None) -> dict[str, Any]:
+        return select_fields(
+            fields,
+            {
+                "listingId": lambda: self.listingId,
+                "name": lambda: self.name,
+                "description": lambda: self.description,
+                "gameId": lambda: self.gameId,
+                "price": lambda: self.price,
+                "copies": lambda: self.copies,
+                "sold": lambda: self.sold,
+                "isActive": lambda: self.isActive,
+                "discount": lambda: (
+                    project(self.discount.to_dict(), subfields(fields, "discount"))
+                    if self.discount
+                    else None
+                ),
+                "intendedDiscounts": lambda: [
+                    intent.discountId for intent in self.intended_discounts
+                ],
+            },
+        )
 
     @classmethod
     def get_all(cls) -> list["Listing"]:
@@ -955,8 +1550,8 @@ class Listing(db.Model):
 class DiscountIntent(db.Model):
     __tablename__ = "DiscountIntents"
     discountIntentId = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    discountId = db.Column(db.Integer, db.ForeignKey("Discounts.discountId"), nullable=False)
-    listingId = db.Column(db.Integer, db.ForeignKey("Listings.listingId"), nullable=False)
+    discountId = db.Column(db.Integer, db.ForeignKey("Discounts.discountId"), nullable=False, index=True)
+    listingId = db.Column(db.Integer, db.ForeignKey("Listings.listingId"), nullable=False, index=True)
 
     discount = db.relationship("Discount", back_populates="intended_listings")
     listing = db.relationship("Listing", back_populates="intended_discounts")
@@ -985,17 +1580,20 @@ class Discount(db.Model):
 
     listings = db.relationship("Listing", back_populates="discount", lazy='dynamic')
 
-    def to_dict(self) -> dict[str, Any]:
-        return {
-            "discountId": self.discountId,
-            "name": self.name,
-            "startDate": self.startDate.isoformat() if self.startDate else None,
-            "endDate": self.endDate.isoformat() if self.endDate else None,
-            "discount": self.discount,
-            "isActive": self.isActive,
-            "intendedListings": [intent.listingId for intent in self.intended_listings],  # List of intended Listing IDs
-            "listingsId": [listing.listingId for listing in self.listings],  # List of applied Listing IDs
-        }
+    def to_dict(self, fields: Fields = None) -> dict[str, Any]:
+        return select_fields(
+            fields,
+            {
+                "discountId": lambda: self.discountId,
+                "name": lambda: self.name,
+                "startDate": lambda: self.startDate.isoformat() if self.startDate else None,
+                "endDate": lambda: self.endDate.isoformat() if self.endDate else None,
+                "discount": lambda: self.discount,
+                "isActive": lambda: self.isActive,
+                "intendedListings": lambda: [intent.listingId for intent in self.intended_listings],  # List of intended Listing IDs
+                "listingsId": lambda: [listing.listingId for listing in self.listings],  # List of applied Listing IDs
+            },
+        )
 
     @classmethod
     def get_all(cls) -> list["Discount"]:
@@ -1025,12 +1623,12 @@ class Discount(db.Model):
 class Subscription(db.Model):
     __tablename__ = "Subscriptions"
     subscriptionId = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False)
+    userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False, index=True)
     listingId = db.Column(
-        db.Integer, db.ForeignKey("Listings.listingId"), nullable=False
+        db.Integer, db.ForeignKey("Listings.listingId"), nullable=False, index=True
     )
     startDate = db.Column(db.DateTime, nullable=False, default=lambda: datetime_now)
-    endDate = db.Column(db.DateTime)
+    endDate = db.Column(db.DateTime, index=True)
     isActive = db.Column(db.Boolean, default=True)
 
     @classmethod
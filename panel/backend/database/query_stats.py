@@ -0,0 +1,93 @@
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from flask import Flask, current_app, g, has_request_context
+from sqlalchemy import event
+from .. import db
+from ..utils.logging import log_debug, log_warning
+
+# A statement repeated this often in one request is most likely a lazy load in a loop
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+
+# Expanded IN lists differ only in their number of placeholders
+_IN_LIST = re.compile(r"\(\?(?:,\s*\?)*\)")
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[_IN_LIST.sub("(?)", statement)] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count > threshold
+        ]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.1f};desc="{self.count} queries"'
+
+
+def get_query_stats() -> QueryStats | None:
+    """Queries of the current request so far, None outside of a request."""
+    return g.get("query_stats") if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if has_request_context():
+        conn.info["query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    start = conn.info.pop("query_start", None)
+    if start is None or not has_request_context():
+        return
+    elapsed = time.perf_counter() - start
+    stats = g.get("query_stats")
+    if stats is None:
+        stats = g.query_stats = QueryStats()
+    stats.record(statement, elapsed)
+
+
+def _add_headers(response):
+    stats = get_query_stats() or QueryStats()
+    # Streamed bodies run their queries later, these only cover the work done so far
+    response.headers["X-Query-Count"] = str(stats.count)
+    response.headers.add("Server-Timing", stats.server_timing())
+    return response
+
+
+def _report(exception) -> None:
+    # Popped, g outlives the request when an app context was already pushed
+    stats = g.pop("query_stats", None)
+    if stats is None:
+        return
+    log_debug(f"{stats.count} queries in {stats.seconds * 1000:.1f} ms")
+    threshold = current_app.config.get("N_PLUS_ONE_THRESHOLD", DEFAULT_N_PLUS_ONE_THRESHOLD)
+    for statement, count in stats.repeated(threshold):
+        log_warning(f"Possible N+1, statement ran {count} times: {statement}")
+
+
+def init_query_stats(app: Flask) -> None:
+    """Counts and times the queries of every request, call after db.init_app.
+
+    The totals go into the X-Query-Count and Server-Timing headers and a debug
+    log line once the request is done, including streamed bodies. Statements
+    repeated more than N_PLUS_ONE_THRESHOLD times are logged as warnings.
+    Set SQL_INSTRUMENTATION to False to turn all of it off.
+    """
+    if not app.config.get("SQL_INSTRUMENTATION", True):
+        return
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
+    app.after_request(_add_headers)
+    app.teardown_request(_report)
@@ -0,0 +1,82 @@
+import base64
+import binascii
+import json
+from typing import Optional
+from .. import db
+
+# External content FTS5 table over Users, created by migration 1 (baseline.SEARCH).
+# The trigram tokenizer indexes every three character sequence, so any
+# substring of 3+ characters is an index lookup.
+SEARCH_COLUMNS = ("username", "email", "HWID", "registerIP", "lastIP")
+# bm25 weights in SEARCH_COLUMNS order, a username hit ranks above an IP hit
+SEARCH_WEIGHTS = (10.0, 5.0, 3.0, 1.0, 1.0)
+
+# Trigrams cannot match shorter terms, those fall back to a scan with LIKE
+MIN_TERM_LENGTH = 3
+
+
+def search_user_ids(query: str, limit: int, offset: int = 0) -> list[int]:
+    """Returns the ids of users matching every term of the query, best match first.
+
+    Terms match anywhere in the username, email, HWID or IPs, case insensitively.
+    """
+    terms = query.split()
+    if not terms:
+        return []
+
+    long_terms = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    short_terms = [term for term in terms if len(term) < MIN_TERM_LENGTH]
+
+    conditions, params = [], {"limit": limit, "offset": offset}
+    if long_terms:
+        conditions.append("UsersSearch MATCH :match")
+        params["match"] = " AND ".join(_quote(term) for term in long_terms)
+    for i, term in enumerate(short_terms):
+        conditions.append(
+            "("
+            + " OR ".join(
+                f"{column} LIKE :like{i} ESCAPE '\\'" for column in SEARCH_COLUMNS
+            )
+            + ")"
+        )
+        params[f"like{i}"] = f"%{_escape_like(term)}%"
+
+    order = "rowid"
+    if long_terms:
+        weights = ", ".join(str(weight) for weight in SEARCH_WEIGHTS)
+        order = f"bm25(UsersSearch, {weights}), rowid"
+
+    rows = db.session.execute(
+        db.text(
+            f"SELECT rowid FROM UsersSearch WHERE {' AND '.join(conditions)} "
+            f"ORDER BY {order} LIMIT :limit OFFSET :offset"
+        ),
+        params,
+    )
+    return [row[0] for row in rows]
+
+
+def encode_offset(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode("utf-8")).decode("ascii")
+
+
+def decode_offset(cursor: Optional[str]) -> int:
+    """Raises ValueError for cursors that were not produced by encode_offset."""
+    if not cursor:
+        return 0
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, dict) or not isinstance(payload.get("o"), int) or payload["o"] < 0:
+        raise ValueError("Invalid cursor")
+    return payload["o"]
+
+
+def _quote(term: str) -> str:
+    # A quoted FTS5 string is matched literally, so user input cannot inject operators
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
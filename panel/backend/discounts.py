@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from .database.models import db, Discount, Listing, DiscountIntent
 from .utils.logging import log_error, log_debug
+from .utils.table_versions import conditional
+from .utils.pagination import paginate
+from .utils.fields import defer_unselected, parse_fields
 from datetime import datetime
 from pydantic import BaseModel
 from typing import Optional
@@ -17,14 +20,38 @@ class DiscountRequestModel(BaseModel):
     isActive: bool = True
     listingsId: int
 
+
+DISCOUNT_SORTABLE = {
+    "name": Discount.name,
+    "discount": Discount.discount,
+    "startDate": Discount.startDate,
+    "endDate": Discount.endDate,
+}
+DISCOUNT_FILTERS = {
+    "isActive": Discount.isActive,
+    "startDate": Discount.startDate,
+    "endDate": Discount.endDate,
+}
+
 @jwt_required()
 @discounts_app.route("/fetch_discounts", methods=["GET"])
+@conditional(Discount, DiscountIntent, Listing)
 def fetch_discounts():
     try:
-        discounts = Discount.get_all()
-
-        discounts_list = [discount.to_dict() for discount in discounts]
-        return jsonify(discounts_list)
+        fields = parse_fields()
+        try:
+            page = paginate(
+                defer_unselected(Discount.query, Discount, fields),
+                Discount.discountId,
+                DISCOUNT_SORTABLE,
+                DISCOUNT_FILTERS,
+            )
+        except ValueError as e:
+            log_error(f"Invalid list parameters: {str(e)}")
+            return {}, 400
+
+        discounts_list = [discount.to_dict(fields) for discount in page.items]
+        return page.response(discounts_list)
     except Exception as e:
         log_error(f"Failed to fetch discounts: {str(e)}")
         return {}, 500
@@ -4,6 +4,7 @@ from flask_jwt_extended import jwt_required
 from pydantic import BaseModel
 from .database.models import db, GameType, Key, Game
 from .utils.logging import log_error, log_info, log_debug
+from .utils.table_versions import conditional
 
 game_types_app = Blueprint("game_types", __name__)
 
@@ -17,6 +18,7 @@ class GameTypeRequestModel(BaseModel):
 
 @jwt_required()
 @game_types_app.route("/fetch_game_types", methods=["GET"])
+@conditional(GameType)
 def fetch_game_types():
     try:
         game_types = GameType.get_all()
@@ -2,8 +2,10 @@ from typing import Optional
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from pydantic import BaseModel
-from .database.models import db, Game, Key, UserGame
+from sqlalchemy.orm import joinedload
+from .database.models import db, Game, GameType, Key, UserGame
 from .utils.logging import log_error, log_info, log_debug
+from .utils.table_versions import conditional
 from .game_types import GameTypeRequestModel
 
 games_app = Blueprint("games", __name__)
@@ -18,10 +20,11 @@ class GameRequestModel(BaseModel):
 
 @jwt_required()
 @games_app.route("/fetch_games", methods=["GET"])
+@conditional(Game, GameType)
 def fetch_games():
     try:
         log_info("Fetching games")
-        games = Game.get_all()
+        games = Game.query.options(joinedload(Game.game_type)).all()
         games_list = [game.to_dict() for game in games]
 
         return jsonify(games_list), 200
@@ -4,11 +4,15 @@ from flask_jwt_extended import jwt_required
 from pydantic import BaseModel, field_validator
 from .database.models import db, Game, GameType, Key
 from .utils.logging import log_error, log_info, log_debug
+from .utils.table_versions import conditional
+from .utils.pagination import ListParams
+from .utils.fields import defer_unselected, parse_fields
+from .utils.streaming import stream_query, wants_stream
 from .utils.invite import generate_invite_code
 from datetime import datetime
 from .game_types import GameTypeRequestModel
 from .games import GameRequestModel
-from .users import UserRequestModel
+from .users import UserRequestModel, USER_MODELS
 
 keys_app = Blueprint("keys", __name__)
 
@@ -25,14 +29,43 @@ class KeyRequestModel(BaseModel):
     isUsed: bool = False
 
 
+KEY_SORTABLE = {
+    "createdAt": Key.createdAt,
+    "usedAt": Key.usedAt,
+}
+KEY_FILTERS = {
+    "gameId": Key.gameId,
+    "gameTypeId": Key.gameTypeId,
+    "createdBy": Key.createdBy,
+    "usedBy": Key.usedBy,
+    "isUsed": Key.isUsed,
+    "createdAt": Key.createdAt,
+    "usedAt": Key.usedAt,
+}
+
+
 @jwt_required()
 @keys_app.route("/fetch_keys", methods=["GET"])
+@conditional(Key, *USER_MODELS)
 def fetch_keys():
     try:
-        keys = Key.get_all()
-        keys_list = [key.to_dict() for key in keys]
+        fields = parse_fields()
+        try:
+            params = ListParams(Key.keyId, KEY_SORTABLE, KEY_FILTERS)
+        except ValueError as e:
+            log_error(f"Invalid list parameters: {str(e)}")
+            return {}, 400
+
+        query = defer_unselected(Key.query, Key, fields).options(*Key.loader_options(fields))
+        if wants_stream() and params.limit is None:
+            return stream_query(
+                params.apply(query), lambda keys: [key.to_dict(fields) for key in keys]
+            )
+
+        page = params.paginate(query)
+        keys_list = [key.to_dict(fields) for key in page.items]
 
-        return jsonify(keys_list)
+        return page.response(keys_list)
     except Exception as e:
         log_error(f"Failed to fetch keys: {str(e)}")
         return {}, 500
@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from .database.models import db, Listing
+from .database.models import db, Listing, Discount, DiscountIntent
 from .utils.logging import log_error, log_debug
+from .utils.table_versions import conditional
+from .utils.pagination import paginate
+from .utils.fields import defer_unselected, parse_fields
 from datetime import datetime
 from pydantic import BaseModel
 from typing import Optional
@@ -24,14 +27,39 @@ class ListingRequestModel(BaseModel):
     endDate: Optional[datetime] = None
 
 
+LISTING_SORTABLE = {
+    "name": Listing.name,
+    "price": Listing.price,
+    "copies": Listing.copies,
+    "sold": Listing.sold,
+}
+LISTING_FILTERS = {
+    "gameId": Listing.gameId,
+    "discountId": Listing.discountId,
+    "isActive": Listing.isActive,
+}
+
+
 @jwt_required()
 @listings_app.route("/fetch_listings", methods=["GET"])
+@conditional(Listing, Discount, DiscountIntent)
 def fetch_listings():
     try:
-        listings = Listing.get_all()
-        listings_list = [listing.to_dict() for listing in listings]
+        fields = parse_fields()
+        try:
+            page = paginate(
+                defer_unselected(Listing.query, Listing, fields),
+                Listing.listingId,
+                LISTING_SORTABLE,
+                LISTING_FILTERS,
+            )
+        except ValueError as e:
+            log_error(f"Invalid list parameters: {str(e)}")
+            return {}, 400
+
+        listings_list = [listing.to_dict(fields) for listing in page.items]
 
-        return jsonify(listings_list)
+        return page.response(listings_list)
     except Exception as e:
         log_error(f"Failed to fetch listings: {str(e)}")
         return {}, 500
@@ -2,11 +2,13 @@ from flask_jwt_extended import jwt_required
 from flask import Blueprint, request, jsonify
 from .database.models import db, Role, Permission, RolePermission
 from .utils.logging import log_error, log_info, log_debug
+from .utils.table_versions import conditional
 
 permissions_app = Blueprint("permissions", __name__)
 
 @jwt_required()
 @permissions_app.route("/fetch_permissions", methods=["GET"])
+@conditional(Permission)
 def fetch_permissions():
     try:
         permissions = Permission.get_all()
@@ -19,6 +21,7 @@ def fetch_permissions():
 
 @jwt_required()
 @permissions_app.route("/fetch_role_permissions", methods=["GET"])
+@conditional(Role)
 def fetch_role_permissions():
     try:
         roles = Role.get_all()
@@ -31,6 +34,7 @@ def fetch_role_permissions():
 
 @jwt_required()
 @permissions_app.route("/fetch_role_permissions/<int:roleId>", methods=["GET"])
+@conditional(Role, RolePermission)
 def fetch_role_permissions_id(roleId: int):
     try:
         role = Role.get_by_id(roleId)
@@ -2,8 +2,12 @@ from typing import Optional
 from flask_jwt_extended import jwt_required
 from flask import Blueprint, request, jsonify
 from pydantic import BaseModel
+from sqlalchemy.orm import selectinload
 from .database.models import db, Role, UserRole, RolePermission, Permission
 from .utils.logging import log_error, log_info, log_debug
+from .utils.table_versions import conditional
+from .utils.pagination import paginate
+from .utils.fields import parse_fields, project, subfields, wants
 
 roles_app = Blueprint("roles", __name__)
 
@@ -15,31 +19,42 @@ class RoleRequestModel(BaseModel):
     color: str
 
 
+ROLE_SORTABLE = {
+    "name": Role.name,
+}
+
+
 @jwt_required()
 @roles_app.route("/fetch_roles", methods=["GET"])
+@conditional(Role, RolePermission, Permission)
 def fetch_roles():
     try:
-        roles = Role.get_all()
-        roles_list = []
-
-        for role in roles:
-            role_dict = role.to_dict()
+        fields = parse_fields()
+        try:
+            query = Role.query
+            if wants(fields, "permissions"):
+                query = query.options(selectinload(Role.permissions))
+            page = paginate(query, Role.roleId, ROLE_SORTABLE)
+        except ValueError as e:
+            log_error(f"Invalid list parameters: {str(e)}")
+            return {}, 400
 
-            role_permissions = RolePermission.get_by_role_id(role.roleId)
+        roles_list = []
 
-            permission_ids = [rp.permissionId for rp in role_permissions]
+        for role in page.items:
+            role_dict = project(role.to_dict(), fields)
+            if not wants(fields, "permissions"):
+                roles_list.append(role_dict)
+                continue
 
-            if permission_ids:
-                permissions = Permission.get_by_ids(permission_ids)
-                role_dict["permissions"] = [
-                    permission.to_dict() for permission in permissions
-                ]
-            else:
-                role_dict["permissions"] = []
+            role_dict["permissions"] = project(
+                [permission.to_dict() for permission in role.permissions],
+                subfields(fields, "permissions"),
+            )
 
             roles_list.append(role_dict)
 
-        return jsonify(roles_list), 200
+        return page.response(roles_list, 200)
 
     except Exception as e:
         log_error(f"Failed to fetch roles: {str(e)}")
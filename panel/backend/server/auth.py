@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, g, request, jsonify
 from .. import jwt
 from functools import wraps
 from flask_jwt_extended import (
@@ -12,10 +12,16 @@ from flask_jwt_extended import (
     verify_jwt_in_request,
     get_jwt_identity,
     get_jwt,
+    get_current_user,
 )
-from ..database.models import db, User, UserRole, Role, UserGame, Game, Permission, RolePermission, datetime_now
+from ..database.models import db, User, UserRole, Role, UserGame, Game, Permission, RolePermission, AuthVersion, UserIdentity, datetime_now
+from ..database.loaders import load
 from ..utils.logging import log_error, log_info, log_debug
-from datetime import timedelta
+from ..utils.auth_versions import auth_versions
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.exc import IntegrityError
+from ..utils.rate_limits import get_ip_key, get_username_key, is_failed_sign_in, limiter, route_limit
+from ..utils.passwords import PasswordPoolFull, hash_password, needs_rehash, password_pool_full_response
 
 auth = Blueprint("auth", __name__)
 
@@ -27,13 +33,12 @@ def permission_required(*permissions):
         @wraps(fn)
         def decorator(*args, **kwargs):
             verify_jwt_in_request()  # Ensure JWT is present
-            current_user_id = get_jwt_identity()  # Get the user ID from the JWT
-            current_identity = current_user
+            current_identity = current_user  # Loaded once per request by user_lookup_callback
 
             if not current_identity:
                 return jsonify({"message": "User not found"}), 404
 
-            if any(permission in current_identity.permissions for permission in permissions):
+            if current_identity.has_any_permission(permissions):
                 return fn(*args, **kwargs)
             else:
                 return jsonify({"message": "Insufficient permissions"}), 403
@@ -45,19 +50,26 @@ def role_required(*roles):
         @wraps(fn)
         def decorator(*args, **kwargs):
             verify_jwt_in_request() # Make sure the JWT is present and valid
-            current_user_id = get_jwt_identity() # Get the user ID from the JWT
-            current_user = User.get_by_id(current_user_id)
-            if not current_user:
-                log_error(f"User with ID {current_user_id} not found")
+            current_identity = current_user # Built from the token claims when they are fresh
+            if not current_identity:
+                log_error(f"User with ID {get_jwt_identity()} not found")
                 return jsonify({"message": "User not found"}), 404
 
-            if any(role in current_user.get_roles() for role in roles):
+            if any(role in current_identity.roles for role in roles):
                 return fn(*args, **kwargs)
             else:
                 return jsonify({"message": "Insufficient permissions"}), 403
         return decorator
     return wrapper
 
+def authorization_claims(user: "User") -> dict | None:
+    """Claims that let requests skip loading the user, if JWT_AUTHORIZATION_CLAIMS is on."""
+    if not current_app.config.get("JWT_AUTHORIZATION_CLAIMS"):
+        return None
+    # Read before the roles, a change landing in between only makes the token stale
+    version = AuthVersion.get_version(user.userId)
+    return user.to_identity().authorization_claims(version)
+
 @jwt.user_identity_loader
 def user_identity_lookup(user: "User") -> str:
     # Convert userId to string to satisfy JWT subject requirement
@@ -69,14 +81,46 @@ def user_lookup_callback(_jwt_header, jwt_data):
     try:
         # Convert string identity back to integer for database lookup
         user_id = int(identity)
-        user = User.get_by_id(user_id)
-        return user.to_identity() if user else None
     except (ValueError, TypeError):
         log_error(f"Failed to parse user ID from JWT: {identity}")
         return None
 
+    claims_enabled = current_app.config.get("JWT_AUTHORIZATION_CLAIMS")
+    if claims_enabled and "authv" in jwt_data and auth_versions.get(user_id) == jwt_data["authv"]:
+        return UserIdentity.from_claims(user_id, jwt_data)
+
+    # Memoized for the request, refresh_authorization_claims reuses the row
+    user = load(User, user_id)
+    if user is None:
+        # Deleted users get a 401, there is no token to refresh
+        return None
+    if claims_enabled:
+        # Stale or missing claims, answered from the database, hand out a new token
+        g.refresh_authorization_claims = True
+    return user.to_identity()
+
+
+@auth.after_app_request
+def refresh_authorization_claims(response):
+    # Only set once the user was loaded, so the JWT and user are both in g
+    if not g.pop("refresh_authorization_claims", False) or g.get("_jwt_extended_jwt_user") is None:
+        return response
+
+    user = load(User, get_current_user().userId)
+    expires = datetime.fromtimestamp(get_jwt()["exp"], timezone.utc) - datetime.now(timezone.utc)
+    if user is None or expires <= timedelta(0):
+        return response
+    # Same expiry as the old token, only the claims are refreshed
+    access_token = create_access_token(
+        identity=user, expires_delta=expires, additional_claims=authorization_claims(user)
+    )
+    set_access_cookies(response, access_token)
+    return response
+
 
 @auth.route("/sign_in", methods=["POST"])
+@limiter.limit(route_limit("sign_in"), key_func=get_ip_key)
+@limiter.limit(route_limit("sign_in_username"), key_func=get_username_key, deduct_when=is_failed_sign_in)
 def sign_in():
     log_info(f"Entered sign_in route")
     data = request.get_json()
@@ -116,13 +160,18 @@ def sign_in():
         if not user.check_password(password):
             log_error(f"Sign in failed: Incorrect password for user '{username}'")
             return jsonify({"message": "Wrong username or password"}), 401
+    except PasswordPoolFull:
+        log_error("Sign in rejected: password hashing queue is full")
+        return password_pool_full_response()
     except Exception as e:
         log_error(f"Password check failed with error: {str(e)}")
         return jsonify({"message": "Authentication error occurred"}), 500
 
-    # Update last login time
+    # Update last login time, and move the hash to the current bcrypt cost
     try:
         user.lastLogin = datetime_now
+        if needs_rehash(user.password):
+            user.password = hash_password(password)
         db.session.commit()
     except Exception as e:
         log_error(f"Failed to update last login time: {str(e)}")
@@ -133,12 +182,15 @@ def sign_in():
     # Create response with JWT token
     response = jsonify({})
     expires = timedelta(days=7) if remember_me else timedelta(hours=1)
-    access_token = create_access_token(identity=user, expires_delta=expires)
+    access_token = create_access_token(
+        identity=user, expires_delta=expires, additional_claims=authorization_claims(user)
+    )
 
     set_access_cookies(response, access_token)
     return response
 
 @auth.route("/sign_up", methods=["POST"])
+@limiter.limit(route_limit("sign_up"), key_func=get_ip_key)
 def sign_up():
     data = request.get_json()
 
@@ -150,15 +202,20 @@ def sign_up():
     if not username or not password or not email:
         return jsonify({"message": "Missing username, password or email"}), 400
 
-    if User.username_exists(username):
-        return jsonify({"message": "Username already taken"}), 400
-
-    if User.email_exists(email):
-        return jsonify({"message": "Email already taken"}), 400
+    conflicts = User.find_conflicts(username=username, email=email)
+    if not conflicts:
+        try:
+            user = User.create(username=username, email=email, password=password, registerIP=request_ip, lastIP=request_ip)
+            db.session.commit()
+        except IntegrityError as e:
+            # Someone took the name between the check and the insert
+            db.session.rollback()
+            conflicts = User.conflicts_from_error(e)
+            if not conflicts:
+                raise
 
-    user = User(username=username, email=email, password=password, registerIP=request_ip, lastIP=request_ip)
-    db.session.add(user)
-    db.session.commit()
+    if conflicts:
+        return jsonify({"message": f"{conflicts[0].capitalize()} already taken"}), 400
 
     log_info(f"User with ID {user.userId} signed up")
     return jsonify({}), 201
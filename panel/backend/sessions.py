@@ -1,19 +1,52 @@
 from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required
 from .database.models import Session
+from .users import USER_MODELS
 from .utils.logging import log_error
+from .utils.table_versions import conditional
+from .utils.pagination import ListParams
+from .utils.fields import defer_unselected, parse_fields
+from .utils.streaming import stream_query, wants_stream
 
 sessions_app = Blueprint("sessions", __name__)
 
+SESSION_SORTABLE = {
+    "status": Session.status,
+    "createdAt": Session.createdAt,
+}
+SESSION_FILTERS = {
+    "userId": Session.userId,
+    "gameId": Session.gameId,
+    "status": Session.status,
+    "createdAt": Session.createdAt,
+}
+
 
 @jwt_required()
 @sessions_app.route("/fetch_sessions", methods=["GET"])
+@conditional(Session, *USER_MODELS)
 def get_sessions():
     try:
-        sessions = Session.get_all()
-        session_list = [session.to_dict() for session in sessions]
+        fields = parse_fields()
+        try:
+            params = ListParams(Session.sessionId, SESSION_SORTABLE, SESSION_FILTERS)
+        except ValueError as e:
+            log_error(f"Invalid list parameters: {str(e)}")
+            return {}, 400
+
+        query = defer_unselected(Session.query, Session, fields).options(
+            *Session.loader_options(fields)
+        )
+        if wants_stream() and params.limit is None:
+            return stream_query(
+                params.apply(query),
+                lambda sessions: [session.to_dict(fields) for session in sessions],
+            )
+
+        page = params.paginate(query)
+        session_list = [session.to_dict(fields) for session in page.items]
 
-        return jsonify(session_list), 200
+        return page.response(session_list, 200)
     except Exception as e:
         log_error(f"Failed to fetch sessions: {str(e)}")
         return {}, 500
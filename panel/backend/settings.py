@@ -2,12 +2,14 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from .database.models import db, Settings, UserSettings
 from .utils.logging import log_error, log_info, log_debug
+from .utils.table_versions import conditional
 
 settings_app = Blueprint("settings", __name__)
 
 
 @jwt_required()
 @settings_app.route("/fetch_user_settings/<int:userId>", methods=["GET"])
+@conditional(Settings, UserSettings)
 def fetch_user_settings(userId: int):
     try:
         user_settings = UserSettings.get_by_userId(userId)
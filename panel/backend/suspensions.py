@@ -1,23 +1,87 @@
 from flask_jwt_extended import jwt_required
 from flask import Blueprint, jsonify, request
 from .database.models import Suspension
+from .users import USER_MODELS
 from .utils.logging import log_error, log_info, log_debug
+from .utils.table_versions import conditional
+from .utils.pagination import paginate
+from .utils.fields import defer_unselected, parse_fields
+from .utils.sync import parse_since, parse_sync_params, sync
 from . import db
 
 suspensions_app = Blueprint("suspensions", __name__)
 
+SUSPENSION_SORTABLE = {
+    "status": Suspension.status,
+    "suspensionStart": Suspension.suspensionStart,
+    "suspensionEnd": Suspension.suspensionEnd,
+    "lastEdit": Suspension.lastEdit,
+}
+SUSPENSION_FILTERS = {
+    "userId": Suspension.userId,
+    "suspendedBy": Suspension.suspendedBy,
+    "status": Suspension.status,
+    "isActive": Suspension.isActive,
+    "suspensionStart": Suspension.suspensionStart,
+    "suspensionEnd": Suspension.suspensionEnd,
+    "lastEdit": Suspension.lastEdit,
+}
+
 
 @jwt_required()
 @suspensions_app.route("/fetch_suspensions", methods=["GET"])
+@conditional(Suspension, *USER_MODELS)
 def fetch_suspensions():
     try:
-        suspensions = Suspension.get_all()
-        suspensions_list = [suspension.to_dict() for suspension in suspensions]
+        fields = parse_fields()
+        try:
+            page = paginate(
+                defer_unselected(Suspension.query, Suspension, fields).options(
+                    *Suspension.loader_options(fields)
+                ),
+                Suspension.suspensionId,
+                SUSPENSION_SORTABLE,
+                SUSPENSION_FILTERS,
+            )
+        except ValueError as e:
+            log_error(f"Invalid list parameters: {str(e)}")
+            return {}, 400
+
+        suspensions_list = [suspension.to_dict(fields) for suspension in page.items]
 
-        return jsonify(suspensions_list), 200
+        return page.response(suspensions_list, 200)
     except Exception as e:
         log_error(f"Failed to fetch suspensions: {str(e)}")
         return {}, 500
+
+
+@jwt_required()
+@suspensions_app.route("/sync_suspensions", methods=["GET"])
+def sync_suspensions():
+    try:
+        fields = parse_fields()
+        try:
+            since = parse_since()
+            params = parse_sync_params(Suspension, Suspension.lastEdit)
+        except ValueError as e:
+            log_error(f"Invalid sync parameters: {str(e)}")
+            return {}, 400
+
+        return sync(
+            defer_unselected(Suspension.query, Suspension, fields).options(
+                *Suspension.loader_options(fields)
+            ),
+            Suspension,
+            Suspension.lastEdit,
+            lambda suspensions: [
+                suspension.to_dict(fields) for suspension in suspensions
+            ],
+            since,
+            params,
+        )
+    except Exception as e:
+        log_error(f"Failed to sync suspensions: {str(e)}")
+        return {}, 500
 """
     suspensionId = db.Column(db.Integer, primary_key=True, autoincrement=True)
     userId = db.Column(db.Integer, db.ForeignKey("Users.userId"), nullable=False)
@@ -108,7 +172,6 @@ def edit_suspension(suspensionId: int):
         suspension.suspendedBy = data.get("suspendedBy", suspension.suspendedBy)
         suspension.suspensionEnd = data.get("suspensionEnd", suspension.suspensionEnd)
         suspension.isActive = data.get("isActive", suspension.isActive)
-        suspension.lastEdit = data.get("lastEdit", suspension.lastEdit)
         db.session.commit()
         
         log_info(f"Suspension with ID {suspensionId} edited")
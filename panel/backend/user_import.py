@@ -0,0 +1,280 @@
+import csv
+import io
+import json
+from typing import IO, Any, Iterable, Iterator, Optional
+from pydantic import ValidationError, field_validator
+from sqlalchemy import insert
+from .database.models import (
+    db,
+    User,
+    Role,
+    Game,
+    Settings,
+    UserRole,
+    UserGame,
+    UserSettings,
+    UserStatus,
+    current_datetime,
+    chunked,
+)
+from .users import UserRequestModel
+from .utils.passwords import PasswordHasher
+from .utils.logging import log_error
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Row number, parsed record and the reason it could not be parsed
+ImportRow = tuple[int, Optional[dict[str, Any]], Optional[str]]
+
+
+class UserImportRequestModel(UserRequestModel):
+    """UserRequestModel with roles and games given by name.
+
+    Accepts both plain names and the role/game objects returned by /fetch_users,
+    so an export can be imported again.
+    """
+
+    status: str = UserStatus.Inactive.value
+    roles: Optional[list[str]] = None
+    games: Optional[list[str]] = None
+
+    @field_validator("roles", "games", mode="before")
+    @classmethod
+    def to_names(cls, value: Any) -> Any:
+        if isinstance(value, str):
+            return [name.strip() for name in value.split(";") if name.strip()]
+        if isinstance(value, list):
+            return [item.get("name") if isinstance(item, dict) else item for item in value]
+        return value
+
+
+def detect_format(filename: Optional[str], mimetype: Optional[str] = None) -> Optional[str]:
+    if filename:
+        extension = filename.rsplit(".", 1)[-1].lower()
+        if extension in ("ndjson", "jsonl"):
+            return "ndjson"
+        if extension == "csv":
+            return "csv"
+    if mimetype in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    if mimetype == "text/csv":
+        return "csv"
+    return None
+
+
+def read_rows(stream: IO[bytes], format: str) -> Iterator[ImportRow]:
+    """Reads records one at a time, so files of any size are never fully loaded.
+
+    CSV columns are the UserRequestModel fields, with roles and games as
+    semicolon separated names. Empty CSV cells are treated as missing.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+    if format == "csv":
+        # Row 1 is the header
+        for row_number, row in enumerate(csv.DictReader(text), start=2):
+            yield row_number, {k: v for k, v in row.items() if k and v not in ("", None)}, None
+        return
+
+    for row_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {str(e)}"
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, "Expected a JSON object"
+            continue
+        yield row_number, record, None
+
+
+def import_user_rows(
+    rows: Iterable[ImportRow],
+    ip: str,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    workers: Optional[int] = None,
+) -> dict[str, Any]:
+    """Validates and inserts users in batches, one transaction per batch.
+
+    Every user gets the Member role and its own settings, same as User.__init__.
+    Returns the number of imported and failed rows and an error per failed row.
+    """
+    report: dict[str, Any] = {"imported": 0, "failed": 0, "errors": []}
+    importer = _UserImporter(ip, report)
+
+    with PasswordHasher(workers) as hasher:
+        batch: list[tuple[int, UserImportRequestModel]] = []
+        for row_number, record, error in rows:
+            model = None
+            if error is None:
+                try:
+                    model = UserImportRequestModel.model_validate(record)
+                except ValidationError as e:
+                    error = _format_validation_error(e)
+            if error is not None:
+                importer.fail(row_number, error)
+                continue
+
+            batch.append((row_number, model))
+            if len(batch) >= batch_size:
+                importer.insert_batch(batch, hasher)
+                batch = []
+        if batch:
+            importer.insert_batch(batch, hasher)
+
+    report["errors"].sort(key=lambda error: error["row"])
+    return report
+
+
+class _UserImporter:
+    def __init__(self, ip: str, report: dict[str, Any]):
+        self.ip = ip
+        self.report = report
+        # Roles and games are small tables, resolve names without a query per row
+        self.role_ids = {role.name: role.roleId for role in Role.get_all()}
+        self.game_ids = {game.name: game.gameId for game in Game.get_all()}
+        self.member_role_id = self.role_ids.get("Member")
+        # Usernames, emails and HWIDs seen earlier in the same file
+        self.seen: dict[str, set[str]] = {"username": set(), "email": set(), "HWID": set()}
+
+    def fail(self, row_number: int, error: str) -> None:
+        self.report["failed"] += 1
+        self.report["errors"].append({"row": row_number, "error": error})
+
+    def insert_batch(
+        self, batch: list[tuple[int, UserImportRequestModel]], hasher: PasswordHasher
+    ) -> None:
+        batch = self._check_conflicts(self._resolve_names(batch))
+        if not batch:
+            return
+
+        passwords = hasher.hash_many([model.password for _, model in batch])
+        now = current_datetime()
+
+        try:
+            user_ids = db.session.scalars(
+                insert(User).returning(User.userId, sort_by_parameter_order=True),
+                [
+                    {
+                        "username": model.username,
+                        "email": model.email,
+                        "password": password,
+                        "HWID": model.HWID,
+                        "registerDate": model.registerDate or now,
+                        "registerIP": model.registerIP or self.ip,
+                        "subscriptionStart": model.subscriptionStart,
+                        "subscriptionEnd": model.subscriptionEnd,
+                        "lastLogin": model.lastLogin,
+                        "lastIP": model.lastIP or self.ip,
+                        "status": model.status,
+                    }
+                    for (_, model), password in zip(batch, passwords)
+                ],
+            ).all()
+
+            settings_ids = db.session.scalars(
+                insert(Settings).returning(Settings.settingsId, sort_by_parameter_order=True),
+                [{} for _ in batch],
+            ).all()
+            db.session.execute(
+                insert(UserSettings),
+                [
+                    {"userId": userId, "settingsId": settingsId}
+                    for userId, settingsId in zip(user_ids, settings_ids)
+                ],
+            )
+
+            user_roles = [
+                {"userId": userId, "roleId": roleId}
+                for userId, (_, model) in zip(user_ids, batch)
+                for roleId in model.roles
+            ]
+            if user_roles:
+                db.session.execute(insert(UserRole), user_roles)
+
+            user_games = [
+                {"userId": userId, "gameId": gameId}
+                for userId, (_, model) in zip(user_ids, batch)
+                for gameId in model.games
+            ]
+            if user_games:
+                db.session.execute(insert(UserGame), user_games)
+
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            log_error(f"Failed to import batch of {len(batch)} users: {str(e)}")
+            for row_number, _ in batch:
+                self.fail(row_number, f"Batch failed: {str(e)}")
+            return
+
+        self.report["imported"] += len(batch)
+
+    def _resolve_names(self, batch):
+        """Replaces role and game names with their ids."""
+        resolved = []
+        for row_number, model in batch:
+            unknown_roles = [name for name in model.roles or [] if name not in self.role_ids]
+            unknown_games = [name for name in model.games or [] if name not in self.game_ids]
+            if unknown_roles:
+                self.fail(row_number, f"Unknown roles: {', '.join(unknown_roles)}")
+                continue
+            if unknown_games:
+                self.fail(row_number, f"Unknown games: {', '.join(unknown_games)}")
+                continue
+
+            role_ids = {self.role_ids[name] for name in model.roles or []}
+            if self.member_role_id is not None:
+                role_ids.add(self.member_role_id)
+            model.roles = sorted(role_ids)
+            model.games = sorted({self.game_ids[name] for name in model.games or []})
+            resolved.append((row_number, model))
+        return resolved
+
+    def _check_conflicts(self, batch):
+        """Drops rows whose username, email or HWID is taken, in the file or the database."""
+        values = {
+            field: [getattr(model, field) for _, model in batch if getattr(model, field)]
+            for field in self.seen
+        }
+        taken = {field: set() for field in self.seen}
+        for field, field_values in values.items():
+            column = getattr(User, field)
+            for chunk in chunked(field_values):
+                taken[field].update(
+                    db.session.scalars(db.select(column).where(column.in_(chunk)))
+                )
+
+        accepted = []
+        for row_number, model in batch:
+            conflict = next(
+                (
+                    field
+                    for field in self.seen
+                    if getattr(model, field)
+                    and (
+                        getattr(model, field) in taken[field]
+                        or getattr(model, field) in self.seen[field]
+                    )
+                ),
+                None,
+            )
+            if conflict is not None:
+                self.fail(row_number, f"{conflict} {getattr(model, conflict)} already exists")
+                continue
+
+            for field in self.seen:
+                if getattr(model, field):
+                    self.seen[field].add(getattr(model, field))
+            accepted.append((row_number, model))
+        return accepted
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}"
+        for detail in error.errors()
+    )
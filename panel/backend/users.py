@@ -1,7 +1,8 @@
 from typing import Optional
 from flask_jwt_extended import jwt_required
-from flask import Blueprint, request, jsonify
-from pydantic import BaseModel
+from flask import Blueprint, request, jsonify, send_file
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import IntegrityError
 from .database.models import (
     db,
     User,
@@ -9,15 +10,28 @@ from .database.models import (
     UserRole,
     UserGame,
     Game,
+    GameType,
     Role,
     UserStatus,
     UserSettings,
     datetime_now,
+    current_datetime,
+    chunked,
 )
 from datetime import datetime, timedelta
-import random, string
+import random, string, os
 from .utils.utils import male_names
 from .utils.logging import log_error, log_info, log_debug
+from .utils.table_versions import conditional
+from .utils.pagination import MAX_LIMIT, Filter, ListParams, Page
+from .utils.fields import defer_unselected, parse_fields
+from .utils.streaming import stream_query, wants_stream
+from .utils.sync import parse_since, parse_sync_params, sync
+from .utils import profile_pictures
+from .utils.rate_limits import limiter, route_limit
+from .server.auth import permission_required
+from .utils.passwords import PasswordPoolFull, password_pool_full_response
+from .database.search import decode_offset, encode_offset, search_user_ids
 from .games import GameRequestModel
 from .roles import RoleRequestModel
 
@@ -42,19 +56,142 @@ class UserRequestModel(BaseModel):
     games: Optional[list[GameRequestModel]] = None
 
 
+class BulkUserStatusRequestModel(BaseModel):
+    userIds: Optional[list[int]] = None
+    filter: Optional[dict[str, str | int | bool]] = None
+    status: UserStatus
+    reason: Optional[str] = None
+    suspendedBy: Optional[int] = None
+
+
+def conflict_response(fields: list[str]):
+    """400 naming each unique field that is already taken, e.g. {"errors": {"email": ...}}."""
+    log_error(f"Already exists: {', '.join(fields)}")
+    return jsonify({"errors": {field: "already exists" for field in fields}}), 400
+
+
+# Tables behind a serialized user, including its roles and games
+USER_MODELS = (User, UserRole, Role, UserGame, Game, GameType)
+
+USER_SORTABLE = {
+    "username": User.username,
+    "email": User.email,
+    "status": User.status,
+    "registerDate": User.registerDate,
+    "lastLogin": User.lastLogin,
+    "lastEdit": User.lastEdit,
+}
+USER_FILTERS = {
+    "status": User.status,
+    "roleId": Filter(
+        lambda roleId: User.userId.in_(
+            db.select(UserRole.userId).where(UserRole.roleId == roleId)
+        ),
+        int,
+    ),
+    "gameId": Filter(
+        lambda gameId: User.userId.in_(
+            db.select(UserGame.userId).where(UserGame.gameId == gameId)
+        ),
+        int,
+    ),
+    "registerDate": User.registerDate,
+    "lastLogin": User.lastLogin,
+    "lastEdit": User.lastEdit,
+}
+
+
 @jwt_required()
 @users_app.route("/fetch_users", methods=["GET"])
+@conditional(*USER_MODELS)
 def fetch_users():
     try:
-        users = User.get_all()
-        users_list = [user.to_dict() for user in users]
+        fields = parse_fields()
+        try:
+            params = ListParams(User.userId, USER_SORTABLE, USER_FILTERS)
+        except ValueError as e:
+            log_error(f"Invalid list parameters: {str(e)}")
+            return {}, 400
+
+        query = defer_unselected(User.query, User, fields)
+        if wants_stream() and params.limit is None:
+            return stream_query(
+                params.apply(query), lambda users: User.to_dict_batch(users, fields)
+            )
 
-        return jsonify(users_list)
+        page = params.paginate(query)
+        users_list = User.to_dict_batch(page.items, fields)
+
+        return page.response(users_list)
     except Exception as e:
         log_error(f"Failed to fetch users: {str(e)}")
         return {}, 500
 
 
+SEARCH_DEFAULT_LIMIT = 25
+
+
+@jwt_required()
+@users_app.route("/search_users", methods=["GET"])
+def search_users():
+    """Ranked substring search over username, email, HWID and IPs, ?q=<terms>.
+
+    Pages with ?limit= and the X-Next-Cursor header like the list routes.
+    """
+    try:
+        fields = parse_fields()
+        try:
+            limit = int(request.args.get("limit", SEARCH_DEFAULT_LIMIT))
+            if not 0 < limit <= MAX_LIMIT:
+                raise ValueError(f"Limit must be between 1 and {MAX_LIMIT}")
+            offset = decode_offset(request.args.get("cursor"))
+        except ValueError as e:
+            log_error(f"Invalid search parameters: {str(e)}")
+            return {}, 400
+
+        user_ids = search_user_ids(request.args.get("q", ""), limit + 1, offset)
+        next_cursor = encode_offset(offset + limit) if len(user_ids) > limit else None
+        user_ids = user_ids[:limit]
+
+        users = {
+            user.userId: user
+            for user in defer_unselected(User.query, User, fields).filter(
+                User.userId.in_(user_ids)
+            )
+        }
+        ranked = [users[userId] for userId in user_ids if userId in users]
+
+        return Page(ranked, next_cursor).response(User.to_dict_batch(ranked, fields))
+    except Exception as e:
+        log_error(f"Failed to search users: {str(e)}")
+        return {}, 500
+
+
+@jwt_required()
+@users_app.route("/sync_users", methods=["GET"])
+def sync_users():
+    try:
+        fields = parse_fields()
+        try:
+            since = parse_since()
+            params = parse_sync_params(User, User.lastEdit)
+        except ValueError as e:
+            log_error(f"Invalid sync parameters: {str(e)}")
+            return {}, 400
+
+        return sync(
+            defer_unselected(User.query, User, fields),
+            User,
+            User.lastEdit,
+            lambda users: User.to_dict_batch(users, fields),
+            since,
+            params,
+        )
+    except Exception as e:
+        log_error(f"Failed to sync users: {str(e)}")
+        return {}, 500
+
+
 @jwt_required()
 @users_app.route("/get_user/<int:userId>", methods=["POST"])
 def get_user(userId: int):
@@ -70,8 +207,74 @@ def get_user(userId: int):
         return {}, 500
 
 
+@jwt_required()
+@users_app.route("/upload_profile_picture/<int:userId>", methods=["POST"])
+@limiter.limit(route_limit("upload_profile_picture"))
+def upload_profile_picture(userId: int):
+    try:
+        limit = profile_pictures.MAX_PICTURE_BYTES
+        # Rejected from the header before anything is read
+        if request.content_length is not None and request.content_length > limit + 64 * 1024:
+            return {"message": "Image size exceeds the limit of 2MB."}, 413
+
+        picture = request.files.get("picture")
+        if picture is None:
+            return {"message": "Missing picture"}, 400
+        data = picture.stream.read(limit + 1)
+        if len(data) > limit:
+            return {"message": "Image size exceeds the limit of 2MB."}, 413
+
+        if not User.get_by_id(userId):
+            log_info(f"User with ID {userId} not found")
+            return {}, 404
+
+        profile_pictures.submit(userId, data)
+        return {}, 202
+    except profile_pictures.InvalidPicture as e:
+        return {"message": str(e)}, 400
+    except Exception as e:
+        log_error(f"Failed to upload profile picture for user with ID {userId}: {e}")
+        return {}, 500
+
+
+@jwt_required()
+@users_app.route("/fetch_profile_picture/<int:userId>", methods=["GET"])
+def fetch_profile_picture(userId: int):
+    try:
+        version = profile_pictures.get_version(userId)
+        if version is None:
+            return {}, 404
+
+        size = request.args.get("size", type=int)
+        if size is not None and size not in profile_pictures.RENDITION_SIZES:
+            return {}, 400
+        path = profile_pictures.get_path(userId, size)
+        if size is not None and not os.path.exists(path):
+            path = profile_pictures.get_path(userId)  # Pictures from before renditions
+
+        response = send_file(
+            os.path.abspath(path),
+            mimetype="image/webp",
+            etag=version if size is None else f"{version}-{size}",
+            conditional=True,
+        )
+        if request.args.get("v") == version:
+            # The URL changes with the content, so the browser never has to revalidate
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = 31536000
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+    except Exception as e:
+        log_error(f"Failed to fetch profile picture for user with ID {userId}: {e}")
+        return {}, 500
+
+
 @jwt_required()
 @users_app.route("/create_random_user", methods=["POST"])
+@limiter.limit(route_limit("create_random_user"))
 def create_random_user():
     try:
         username = random.choice(male_names)
@@ -84,7 +287,16 @@ def create_random_user():
         clientIp = str(request.remote_addr)
         random_date = datetime_now - timedelta(days=random.randint(1, 365))
 
-        new_user = User(
+        default_role = Role.get_by_name("Member")
+        if not default_role:
+            log_error("Default role not found")
+
+        default_game = Game.get_by_name("CS2")
+        if not default_game:
+            log_error("Default game not found")
+
+        new_user = User.create(
+            gameIds=[default_game.gameId] if default_game else [],
             username=username,
             email=email,
             password=password,
@@ -96,33 +308,48 @@ def create_random_user():
             lastLogin=lastLogin,
             lastIP=clientIp,
         )
-
-        default_role = Role.get_by_name("Member")
-        if default_role:
-            existing_roles = UserRole.get_by_id(new_user.userId, default_role.roleId)
-            if not existing_roles:
-                user_role = UserRole(userId=new_user.userId, roleId=default_role.roleId)
-                db.session.add(user_role)
-        else:
-            log_error("Default role not found")
-
-        default_game = Game.get_by_name("CS2")
-        if default_game:
-            user_game = UserGame(userId=new_user.userId, gameId=default_game.gameId)
-            db.session.add(user_game)
-        else:
-            log_error("Default game not found")
-
         db.session.commit()
 
         log_info(f"Random user with ID {new_user.userId} created")
         return jsonify(new_user.to_dict()), 200
+    except PasswordPoolFull:
+        db.session.rollback()
+        return password_pool_full_response()
     except Exception as e:
         db.session.rollback()
         log_error(f"Error creating a random user: {e}")
         return {}, 500
 
 
+@users_app.route("/import_users", methods=["POST"])
+@jwt_required()
+@permission_required("create_user")
+def import_users():
+    # Imported here, user_import builds on UserRequestModel from this module
+    from .user_import import IMPORT_FORMATS, detect_format, import_user_rows, read_rows
+
+    try:
+        upload = request.files.get("file")
+        if upload is not None:
+            stream, filename, mimetype = upload.stream, upload.filename, upload.mimetype
+        else:
+            stream, filename, mimetype = request.stream, None, request.mimetype
+
+        format = request.args.get("format") or detect_format(filename, mimetype)
+        if format not in IMPORT_FORMATS:
+            log_error(f"Unsupported import format: {format}")
+            return {}, 400
+
+        report = import_user_rows(read_rows(stream, format), ip=str(request.remote_addr))
+
+        log_info(f"Imported {report['imported']} users, {report['failed']} rows failed")
+        return jsonify(report), 200
+    except Exception as e:
+        db.session.rollback()
+        log_error(f"Error importing users: {e}")
+        return {}, 500
+
+
 @jwt_required()
 @users_app.route("/create_user", methods=["POST"])
 def create_user():
@@ -152,19 +379,13 @@ def create_user():
         email = data.get("email")
         hwid = data.get("HWID")
 
-        if User.username_exists_except_id(username, undo):
-            log_error(f"Username {username} already exists")
-            return {}, 400
-
-        if User.email_exists_except_id(email, undo):
-            log_error(f"Email {email} already exists")
-            return {}, 400
-
-        if hwid and User.hwid_exists_except_id(hwid, undo):
-            log_error(f"HWID {hwid} already exists")
-            return {}, 400
+        conflicts = User.find_conflicts(username, email, hwid, exceptId=undo)
+        if conflicts:
+            return conflict_response(conflicts)
 
-        new_user = User(
+        new_user = User.create(
+            roleIds=[role.get("roleId") for role in data.get("roles") or []],
+            gameIds=[game.get("gameId") for game in data.get("games") or []],
             userId=undo,
             username=username,
             email=email,
@@ -177,32 +398,25 @@ def create_user():
             lastIP=request_ip,
             status=data.get("status"),
         )
-
-        db.session.add(new_user)
         db.session.commit()
 
-        roles = data.get("roles")
-        if roles:
-            for role in roles:
-                role_id = role.get("roleId")
-                user_role = UserRole(userId=new_user.userId, roleId=role_id)
-                db.session.add(user_role)
-            db.session.commit()
-
-        games = data.get("games")
-        if games:
-            for game in games:
-                game_id = game.get("gameId")
-                user_game = UserGame(userId=new_user.userId, gameId=game_id)
-                db.session.add(user_game)
-            db.session.commit()
-
         log_info(
             f"User with ID {new_user.userId} created"
             if undo is None
             else f"User with ID {new_user.userId} restored"
         )
         return jsonify(new_user.to_dict()), 200
+    except PasswordPoolFull:
+        db.session.rollback()
+        return password_pool_full_response()
+    except IntegrityError as e:
+        # Lost the race against a concurrent write, the unique indexes caught it
+        db.session.rollback()
+        conflicts = User.conflicts_from_error(e)
+        if conflicts:
+            return conflict_response(conflicts)
+        log_error(f"Error creating user: {e}")
+        return {}, 500
     except Exception as e:
         db.session.rollback()
         log_error(f"Error creating user: {e}")
@@ -220,20 +434,13 @@ def edit_user(userId: int):
             log_error(f"User with ID {userId} not found")
             return {}, 404
 
-        user.username = data.get("username", user.username)
-        if User.username_exists_except_id(user.username, userId):
-            return {}, 400
-
-        user.email = data.get("email", user.email)
-        if User.email_exists_except_id(user.email, userId):
-            return {}, 400
-
-        user.password = data.get("password", user.password)
-        user.HWID = data.get("HWID", user.HWID)
-        if User.hwid_exists_except_id(user.HWID, userId) and user.HWID != "":
-            return {}, 400
-
-        user.status = data.get("status", user.status)
+        # Validate everything before touching the user, so nothing is flushed early
+        username = data.get("username", user.username)
+        email = data.get("email", user.email)
+        hwid = data.get("HWID", user.HWID)
+        conflicts = User.find_conflicts(username, email, hwid, exceptId=userId)
+        if conflicts:
+            return conflict_response(conflicts)
 
         subscription = data.get("subscription")
         subscriptionStart, subscriptionEnd = None, None
@@ -249,45 +456,39 @@ def edit_user(userId: int):
                     subscription_end, "%Y-%m-%dT%H:%M:%S.%fZ"
                 )
 
-        user.subscriptionStart = subscriptionStart
-        user.subscriptionEnd = subscriptionEnd
-
         received_role_ids = set(
             int(role.get("roleId")) for role in data.get("roles", [])
         )
-        existing_roles = {ur.roleId for ur in UserRole.get_by_userId(userId)}
-
-        roles_to_add = received_role_ids - existing_roles
-        for role_id in roles_to_add:
-            new_user_role = UserRole(userId=userId, roleId=role_id)
-            db.session.add(new_user_role)
-
-        roles_to_remove = existing_roles - received_role_ids
-        for role_id in roles_to_remove:
-            UserRole.delete(userId, role_id)
-
         received_game_ids = set(
             int(game.get("gameId")) for game in data.get("games", [])
         )
-        existing_games = {ug.gameId for ug in UserGame.get_by_userId(userId)}
 
-        games_to_add = received_game_ids - existing_games
-        for game_id in games_to_add:
-            new_user_game = UserGame(userId=userId, gameId=game_id)
-            db.session.add(new_user_game)
+        if not subscriptionStart and received_game_ids:
+            return {}, 400
 
-        games_to_remove = existing_games - received_game_ids
-        for game_id in games_to_remove:
-            UserGame.delete(userId, game_id)
+        user.username = username
+        user.email = email
+        user.password = data.get("password", user.password)
+        user.HWID = hwid
+        user.status = data.get("status", user.status)
+        user.subscriptionStart = subscriptionStart
+        user.subscriptionEnd = subscriptionEnd
 
-        if not user.subscriptionStart and received_game_ids:
-            return {}, 400
+        UserRole.set_for_user(userId, received_role_ids)
+        UserGame.set_for_user(userId, received_game_ids)
 
-        user.lastEdit = datetime_now
+        user.lastEdit = current_datetime()
         db.session.commit()
 
         log_info(f"User with ID {userId} edited")
         return {}, 200
+    except IntegrityError as e:
+        db.session.rollback()
+        conflicts = User.conflicts_from_error(e)
+        if conflicts:
+            return conflict_response(conflicts)
+        log_error(f"Error editing user with ID {userId}: {e}")
+        return {}, 500
     except Exception as e:
         db.session.rollback()
         log_error(f"Error editing user with ID {userId}: {e}")
@@ -307,7 +508,7 @@ def update_user_status(userId: int):
             return {}, 404
 
         user.status = user_status
-        user.lastEdit = datetime_now
+        user.lastEdit = current_datetime()
         if (
             user_status == UserStatus.Banned.value
             or user_status == UserStatus.Frozen.value
@@ -331,6 +532,104 @@ def update_user_status(userId: int):
         return {}, 500
 
 
+@users_app.route("/bulk_update_user_status", methods=["POST"])
+@jwt_required()
+@permission_required("update_user")
+def bulk_update_user_status():
+    """Sets the status of many users at once, selected by userIds or by a USER_FILTERS filter.
+
+    Reports "updated", "unchanged" (already had the status) or "not_found" per user.
+    """
+    try:
+        try:
+            data = BulkUserStatusRequestModel.model_validate(request.get_json())
+        except ValidationError as e:
+            log_error(f"Invalid bulk status request: {str(e)}")
+            return {}, 400
+
+        if (data.userIds is None) == (data.filter is None):
+            log_error("Bulk status update needs either userIds or a filter")
+            return {}, 400
+
+        suspends = data.status in (UserStatus.Banned, UserStatus.Frozen)
+        if suspends and data.suspendedBy is None:
+            log_error("Bulk ban or freeze needs suspendedBy")
+            return {}, 400
+
+        query = db.select(User.userId, User.status)
+        if data.filter is not None:
+            try:
+                params = ListParams(
+                    User.userId,
+                    filters=USER_FILTERS,
+                    args={name: str(value) for name, value in data.filter.items()},
+                )
+            except ValueError as e:
+                log_error(f"Invalid bulk status filter: {str(e)}")
+                return {}, 400
+            if not params.conditions:
+                # An empty filter would silently target every user
+                log_error("Bulk status filter does not match any known filter")
+                return {}, 400
+            current = dict(db.session.execute(query.where(*params.conditions)).all())
+            requested = list(current)
+        else:
+            requested = list(dict.fromkeys(data.userIds))
+            current = {}
+            for chunk in chunked(requested):
+                current.update(db.session.execute(query.where(User.userId.in_(chunk))).all())
+
+        status = data.status.value
+        to_update = [
+            userId for userId in requested if userId in current and current[userId] != status
+        ]
+
+        now = current_datetime()
+        for chunk in chunked(to_update):
+            db.session.execute(
+                db.update(User)
+                .where(User.userId.in_(chunk))
+                .values(status=status, lastEdit=now),
+                execution_options={"synchronize_session": False},
+            )
+        if suspends and to_update:
+            db.session.execute(
+                db.insert(Suspension),
+                [
+                    {
+                        "userId": userId,
+                        "status": status,
+                        "reason": data.reason or f"Status changed to {status}",
+                        "suspendedBy": data.suspendedBy,
+                        "suspensionStart": now,
+                        "isActive": True,
+                    }
+                    for userId in to_update
+                ],
+            )
+        db.session.commit()
+
+        updated = set(to_update)
+        results = [
+            {
+                "userId": userId,
+                "outcome": (
+                    "not_found"
+                    if userId not in current
+                    else "updated" if userId in updated else "unchanged"
+                ),
+            }
+            for userId in requested
+        ]
+
+        log_info(f"Bulk updated status of {len(to_update)} users to {status}")
+        return jsonify({"updated": len(to_update), "results": results}), 200
+    except Exception as e:
+        db.session.rollback()
+        log_error(f"Error bulk updating user status: {str(e)}")
+        return {}, 500
+
+
 @jwt_required()
 @users_app.route("/delete_user/<int:userId>", methods=["DELETE"])
 def delete_user(userId: int):
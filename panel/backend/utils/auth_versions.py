@@ -0,0 +1,181 @@
+import time
+from threading import Lock
+from typing import Any, Iterable, Optional
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession
+from ..database.models import (
+    db,
+    AuthVersion,
+    Permission,
+    Role,
+    RolePermission,
+    User,
+    UserRole,
+    chunked,
+)
+
+# Other processes bump versions too, so cached versions are re-read after this long
+VERSION_TTL_SECONDS = 5.0
+# Changing any of these on a user makes the identity in their token stale
+USER_FIELDS = ("username", "email", "status")
+
+
+class AuthVersionCache:
+    """userId -> AuthVersions.version, so checking a token's claims rarely queries.
+
+    Commits in this process evict the users they bumped right away, bumps made
+    by other processes are picked up within VERSION_TTL_SECONDS.
+    """
+
+    MAX_USERS = 10_000
+
+    def __init__(self):
+        self._versions: dict[int, tuple[int, float]] = {}
+        self._lock = Lock()
+
+    def get(self, userId: int) -> int:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._versions.get(userId)
+        if cached is not None and now - cached[1] < VERSION_TTL_SECONDS:
+            return cached[0]
+
+        version = AuthVersion.get_version(userId)
+        with self._lock:
+            if len(self._versions) >= self.MAX_USERS:
+                self._versions.clear()
+            self._versions[userId] = (version, now)
+        return version
+
+    def evict(self, userIds: Iterable[int]) -> None:
+        with self._lock:
+            for userId in userIds:
+                self._versions.pop(userId, None)
+
+
+auth_versions = AuthVersionCache()
+
+
+def bump_auth_versions(connection, userIds: Iterable[int]) -> None:
+    """Increments the version of every user, inside the caller's transaction."""
+    for chunk in chunked(sorted(set(userIds))):
+        connection.execute(
+            db.text(
+                "INSERT INTO AuthVersions (userId, version) VALUES (:userId, 1) "
+                "ON CONFLICT (userId) DO UPDATE SET version = version + 1"
+            ),
+            [{"userId": userId} for userId in chunk],
+        )
+
+
+def _role_holders(connection, roleIds: set[int]) -> set[int]:
+    userIds = set()
+    for chunk in chunked(sorted(roleIds)):
+        userIds.update(
+            connection.scalars(db.select(UserRole.userId).where(UserRole.roleId.in_(chunk)))
+        )
+    return userIds
+
+
+def _permission_holders(connection, permissionIds: set[int]) -> set[int]:
+    roleIds = set()
+    for chunk in chunked(sorted(permissionIds)):
+        roleIds.update(
+            connection.scalars(
+                db.select(RolePermission.roleId).where(RolePermission.permissionId.in_(chunk))
+            )
+        )
+    return _role_holders(connection, roleIds)
+
+
+def _changed(obj: Any, fields: Iterable[str]) -> bool:
+    attrs = inspect(obj).attrs
+    return any(attrs[field].history.has_changes() for field in fields)
+
+
+def _bumped(session: OrmSession) -> set:
+    return session.info.setdefault("auth_bumped", set())
+
+
+@event.listens_for(OrmSession, "before_flush")
+def _bump_flushed_users(session: OrmSession, flush_context, instances) -> None:
+    # Runs before the flush, so holders of a role deleted in it can still be found
+    userIds, roleIds, permissionIds = set(), set(), set()
+    for obj in session.new:
+        if isinstance(obj, UserRole):
+            userIds.add(obj.userId)
+        elif isinstance(obj, RolePermission):
+            roleIds.add(obj.roleId)
+    for obj in session.dirty:
+        if isinstance(obj, User) and _changed(obj, USER_FIELDS):
+            userIds.add(obj.userId)
+        elif isinstance(obj, Role) and _changed(obj, ("name",)):
+            roleIds.add(obj.roleId)
+        elif isinstance(obj, Permission) and _changed(obj, ("name",)):
+            permissionIds.add(obj.permissionId)
+    for obj in session.deleted:
+        if isinstance(obj, (User, UserRole)):
+            userIds.add(obj.userId)
+        elif isinstance(obj, (Role, RolePermission)):
+            roleIds.add(obj.roleId)
+        elif isinstance(obj, Permission):
+            permissionIds.add(obj.permissionId)
+    if not (userIds or roleIds or permissionIds):
+        return
+
+    connection = session.connection()
+    userIds |= _role_holders(connection, roleIds) if roleIds else set()
+    userIds |= _permission_holders(connection, permissionIds) if permissionIds else set()
+    bump_auth_versions(connection, userIds)
+    _bumped(session).update(userIds)
+
+
+@event.listens_for(OrmSession, "do_orm_execute")
+def _bump_bulk_users(orm_execute_state) -> None:
+    # insert()/update()/delete() statements bypass the flush, resolve their rows up front
+    mapper = orm_execute_state.bind_mapper
+    if orm_execute_state.is_select or mapper is None:
+        return
+    model = mapper.class_
+    if model not in (User, UserRole, Role, RolePermission, Permission):
+        return
+
+    connection = orm_execute_state.session.connection()
+    statement = orm_execute_state.statement
+    userIds: Optional[set[int]] = None
+    if orm_execute_state.is_insert:
+        # New users, roles and permissions are not held by anyone yet
+        if model in (UserRole, RolePermission):
+            key = "userId" if model is UserRole else "roleId"
+            parameters = orm_execute_state.parameters
+            rows = parameters if isinstance(parameters, list) else [parameters or {}]
+            ids = {row[key] for row in rows if key in row}
+            userIds = ids if model is UserRole else _role_holders(connection, ids)
+    else:
+        key = {User: "userId", UserRole: "userId", Role: "roleId", RolePermission: "roleId"}.get(
+            model, "permissionId"
+        )
+        query = db.select(getattr(model, key))
+        if statement.whereclause is not None:
+            query = query.where(statement.whereclause)
+        ids = set(connection.scalars(query))
+        if model in (User, UserRole):
+            userIds = ids
+        elif model is Permission:
+            userIds = _permission_holders(connection, ids)
+        else:
+            userIds = _role_holders(connection, ids)
+
+    if userIds:
+        bump_auth_versions(connection, userIds)
+        _bumped(orm_execute_state.session).update(userIds)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _evict_committed_versions(session: OrmSession) -> None:
+    auth_versions.evict(session.info.pop("auth_bumped", ()))
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_bumped_versions(session: OrmSession) -> None:
+    session.info.pop("auth_bumped", None)
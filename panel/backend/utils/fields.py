@@ -0,0 +1,77 @@
+from typing import Any, Callable, Mapping, Optional
+from flask import request
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+# Selected fields as a tree, e.g. {"userId": None, "roles": {"name": None}}.
+# None selects everything below that point.
+Fields = Optional[dict[str, "Fields"]]
+
+
+def parse_fields(raw: Optional[str] = None) -> Fields:
+    """Parses a ?fields= value such as "userId,roles.name,games.gameType.name"."""
+    if raw is None:
+        raw = request.args.get("fields")
+    if not raw:
+        return None
+
+    tree: dict[str, Fields] = {}
+    for path in raw.split(","):
+        parts = [part.strip() for part in path.split(".") if part.strip()]
+        node = tree
+        for depth, part in enumerate(parts):
+            if part in node and node[part] is None:
+                break  # Parent already selected with all its attributes
+            if depth == len(parts) - 1:
+                node[part] = None
+            else:
+                node = node.setdefault(part, {})
+    return tree or None
+
+
+def wants(fields: Fields, name: str) -> bool:
+    return fields is None or name in fields
+
+
+def subfields(fields: Fields, name: str) -> Fields:
+    return None if fields is None else fields.get(name)
+
+
+def select_fields(fields: Fields, values: Mapping[str, Callable[[], Any]]) -> dict[str, Any]:
+    """Builds a dict from the selected entries only, so unselected attributes are never read."""
+    return {name: value() for name, value in values.items() if wants(fields, name)}
+
+
+def project(data: Any, fields: Fields) -> Any:
+    """Prunes an already built dict, or list of dicts, to the selected fields."""
+    if fields is None or data is None:
+        return data
+    if isinstance(data, list):
+        return [project(item, fields) for item in data]
+    return {
+        name: project(value, fields[name])
+        for name, value in data.items()
+        if name in fields
+    }
+
+
+def defer_unselected(query, model: Any, fields: Fields):
+    """Restricts the query to the columns backing the selected top-level fields.
+
+    Models map output fields that are not plain columns through __field_columns__,
+    e.g. {"subscription": ("subscriptionStart", "subscriptionEnd")}.
+    """
+    if fields is None:
+        return query
+
+    mapper = inspect(model)
+    aliases = getattr(model, "__field_columns__", {})
+    column_names = {column.key for column in mapper.primary_key}
+    for name in fields:
+        for column_name in aliases.get(name, (name,)):
+            if column_name in mapper.column_attrs:
+                column_names.add(column_name)
+
+    return query.options(
+        load_only(*(getattr(model, column_name) for column_name in column_names))
+    )
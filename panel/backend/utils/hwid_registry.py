@@ -0,0 +1,114 @@
+import re
+from threading import Lock
+from typing import Iterable, Optional
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as OrmSession
+from ..database.models import db, User
+
+# Separators clients put between the fields of a payload, e.g. "1718000000,HWID,info"
+_TOKEN_SEPARATORS = re.compile(r"[\s,;:|()]+")
+
+
+class HWIDRegistry:
+    """In-memory HWID -> userId index over Users.HWID.
+
+    Loaded from the database on first use and then kept current by the ORM
+    events below, so lookups are a dict access instead of a query or scan.
+    Needs an app context the first time, and after bulk writes to Users.
+    """
+
+    def __init__(self):
+        self._users: Optional[dict[str, int]] = None
+        self._lock = Lock()
+
+    def lookup(self, HWID: Optional[str]) -> Optional[int]:
+        if not HWID:
+            return None
+        return self._index().get(HWID)
+
+    def find_user(self, tokens: Iterable[str]) -> Optional[int]:
+        """Returns the user owning the first registered HWID among the tokens."""
+        users = self._index()
+        for token in tokens:
+            if token in users:
+                return users[token]
+        return None
+
+    def match(self, data: str) -> Optional[int]:
+        """Looks up every field of a raw client payload as an exact HWID."""
+        return self.find_user(token for token in _TOKEN_SEPARATORS.split(data) if token)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._users = None
+
+    def apply(self, changes: list[tuple[Optional[str], Optional[str], int]]) -> None:
+        """Applies committed (old HWID, new HWID, userId) changes."""
+        with self._lock:
+            if self._users is None:
+                return  # Not loaded yet, the first lookup reads the committed state
+            for old, new, userId in changes:
+                if old and self._users.get(old) == userId:
+                    del self._users[old]
+                if new:
+                    self._users[new] = userId
+
+    def _index(self) -> dict[str, int]:
+        users = self._users
+        if users is not None:
+            return users
+        with self._lock:
+            if self._users is None:
+                rows = db.session.execute(
+                    db.select(User.HWID, User.userId).where(
+                        User.HWID.isnot(None), User.HWID != ""
+                    )
+                )
+                self._users = {HWID: userId for HWID, userId in rows}
+            return self._users
+
+
+hwid_registry = HWIDRegistry()
+
+
+def _pending(session: OrmSession) -> list:
+    return session.info.setdefault("hwid_changes", [])
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_hwid_changes(session: OrmSession, flush_context) -> None:
+    for user in session.new:
+        if isinstance(user, User):
+            _pending(session).append((None, user.HWID, user.userId))
+    for user in session.dirty:
+        if isinstance(user, User):
+            history = inspect(user).attrs.HWID.history
+            if history.has_changes():
+                old = history.deleted[0] if history.deleted else None
+                _pending(session).append((old, user.HWID, user.userId))
+    for user in session.deleted:
+        if isinstance(user, User):
+            _pending(session).append((user.HWID, None, user.userId))
+
+
+@event.listens_for(OrmSession, "do_orm_execute")
+def _collect_bulk_user_writes(orm_execute_state) -> None:
+    # Bulk INSERT/UPDATE/DELETE on Users bypass the flush, reload on the next lookup
+    mapper = orm_execute_state.bind_mapper
+    if not orm_execute_state.is_select and mapper is not None and mapper.class_ is User:
+        orm_execute_state.session.info["hwid_stale"] = True
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_hwid_changes(session: OrmSession) -> None:
+    changes = session.info.pop("hwid_changes", [])
+    if session.info.pop("hwid_stale", False):
+        hwid_registry.invalidate()
+    elif changes:
+        hwid_registry.apply(changes)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_hwid_changes(session: OrmSession) -> None:
+    session.info.pop("hwid_changes", None)
+    session.info.pop("hwid_stale", None)
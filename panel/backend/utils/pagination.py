@@ -0,0 +1,209 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, Mapping, Optional
+from flask import Response, jsonify, request
+from sqlalchemy import Boolean, DateTime, Integer, and_, or_
+from ..database.database import cet
+
+MAX_LIMIT = 500
+
+
+class Filter:
+    """Custom filter for query parameters that do not map onto a single column.
+
+    ``clause`` receives the parsed value and returns a SQL condition.
+    """
+
+    def __init__(self, clause: Callable[[Any], Any], parse: Callable[[str], Any] = str):
+        self.clause = clause
+        self.parse = parse
+
+
+class Page:
+    def __init__(self, items: list, next_cursor: Optional[str] = None):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def response(self, items_list: list, status: int = 200) -> tuple[Response, int]:
+        response = jsonify(items_list)
+        if self.next_cursor is not None:
+            response.headers["X-Next-Cursor"] = self.next_cursor
+        return response, status
+
+
+class ListParams:
+    """Sorting, filtering and keyset pagination parsed from the query string.
+
+    Supported parameters:
+        limit       page size, at most MAX_LIMIT (the whole list when omitted)
+        cursor      opaque value from the X-Next-Cursor header of the previous page
+        sort        one of the sortable columns, the primary key by default
+        order       asc or desc
+        <filter>    equality filter, e.g. status=banned, gameId=1, isUsed=false
+        <filter>From / <filter>To
+                    inclusive bounds for DateTime filters, e.g. createdAtFrom=2024-01-01
+
+    Raises ValueError for invalid parameters.
+    """
+
+    def __init__(
+        self,
+        key: Any,
+        sortable: Optional[Mapping[str, Any]] = None,
+        filters: Optional[Mapping[str, Any]] = None,
+        args: Optional[Mapping[str, str]] = None,
+    ):
+        args = request.args if args is None else args
+        self.key = key
+        self.sortable = {key.key: key, **(sortable or {})}
+        self.filters = filters or {}
+
+        self.sort = args.get("sort", key.key)
+        if self.sort not in self.sortable:
+            raise ValueError(f"Cannot sort by '{self.sort}'")
+        self.column = self.sortable[self.sort]
+
+        order = args.get("order", "asc")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Invalid order '{order}'")
+        self.descending = order == "desc"
+
+        self.limit = None
+        if args.get("limit") is not None:
+            self.limit = _parse_int(args["limit"])
+            if not 0 < self.limit <= MAX_LIMIT:
+                raise ValueError(f"Limit must be between 1 and {MAX_LIMIT}")
+
+        self.cursor = _decode_cursor(args["cursor"]) if args.get("cursor") else None
+        if self.cursor is not None and self.cursor["s"] != self.sort:
+            raise ValueError("Cursor does not match the requested sort")
+        if self.cursor is not None and self.cursor["d"] != self.descending:
+            raise ValueError("Cursor does not match the requested order")
+
+        self.conditions = []
+        for name, spec in self.filters.items():
+            if isinstance(spec, Filter):
+                if args.get(name) is not None:
+                    self.conditions.append(spec.clause(spec.parse(args[name])))
+            elif isinstance(spec.type, DateTime):
+                if args.get(f"{name}From") is not None:
+                    self.conditions.append(spec >= parse_datetime(args[f"{name}From"]))
+                if args.get(f"{name}To") is not None:
+                    self.conditions.append(spec <= parse_datetime(args[f"{name}To"]))
+            elif args.get(name) is not None:
+                self.conditions.append(spec == _parse_value(spec, args[name]))
+
+    def apply(self, query):
+        """Applies filters, ordering, the cursor position and limit + 1 to the query."""
+        if self.conditions:
+            query = query.filter(*self.conditions)
+
+        if self.cursor is not None:
+            value = self.cursor["v"]
+            if value is not None and isinstance(self.column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            query = query.filter(self._after(value, self.cursor["k"]))
+
+        columns = [self.key] if self.column is self.key else [self.column, self.key]
+        if self.descending:
+            query = query.order_by(*(column.desc() for column in columns))
+        else:
+            query = query.order_by(*(column.asc() for column in columns))
+
+        if self.limit is not None:
+            query = query.limit(self.limit + 1)
+        return query
+
+    def paginate(self, query) -> Page:
+        items = self.apply(query).all()
+        if self.limit is None or len(items) <= self.limit:
+            return Page(items)
+
+        items = items[: self.limit]
+        return Page(items, self.cursor_for(items[-1]))
+
+    def cursor_for(self, item: Any) -> str:
+        value = getattr(item, self.column.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+
+        payload = {
+            "s": self.sort,
+            "d": self.descending,
+            "v": value,
+            "k": getattr(item, self.key.key),
+        }
+        return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+    def _after(self, value: Any, key_value: Any):
+        column, key = self.column, self.key
+        if column is key:
+            return key < key_value if self.descending else key > key_value
+
+        # SQLite sorts NULLs first in ascending and last in descending order
+        if self.descending:
+            if value is None:
+                return and_(column.is_(None), key < key_value)
+            return or_(
+                column < value,
+                column.is_(None),
+                and_(column == value, key < key_value),
+            )
+        if value is None:
+            return or_(column.isnot(None), and_(column.is_(None), key > key_value))
+        return or_(column > value, and_(column == value, key > key_value))
+
+
+def paginate(
+    query,
+    key: Any,
+    sortable: Optional[Mapping[str, Any]] = None,
+    filters: Optional[Mapping[str, Any]] = None,
+) -> Page:
+    return ListParams(key, sortable, filters).paginate(query)
+
+
+def _decode_cursor(cursor: str) -> dict[str, Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, dict) or not {"s", "d", "v", "k"} <= payload.keys():
+        raise ValueError("Invalid cursor")
+    return payload
+
+
+def _parse_value(column: Any, value: str) -> Any:
+    if isinstance(column.type, Boolean):
+        return _parse_bool(value)
+    if isinstance(column.type, Integer):
+        return _parse_int(value)
+    return value
+
+
+def _parse_int(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Invalid integer '{value}'")
+
+
+def _parse_bool(value: str) -> bool:
+    if value.lower() in ("true", "1", "yes"):
+        return True
+    if value.lower() in ("false", "0", "no"):
+        return False
+    raise ValueError(f"Invalid boolean '{value}'")
+
+
+def parse_datetime(value: str) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}'")
+    # Stored datetimes are naive local (Europe/Prague) times
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(cet).replace(tzinfo=None)
+    return parsed
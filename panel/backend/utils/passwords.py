@@ -0,0 +1,210 @@
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from threading import BoundedSemaphore, Lock
+from typing import Any, Callable, Optional
+import bcrypt
+from flask import Flask, jsonify
+from .logging import log_info
+
+# Cost used when calibration is off, bcrypt's own default
+DEFAULT_ROUNDS = 12
+# Calibration never goes below the cost existing hashes were made with
+MIN_ROUNDS = DEFAULT_ROUNDS
+MAX_ROUNDS = 16
+# Cheap cost timed by calibration, each extra round doubles it
+SAMPLE_ROUNDS = 10
+# Calibration picks the highest cost that hashes within this time on this machine
+DEFAULT_TARGET_MS = 250
+# Hashes waiting for a worker before new ones are turned away with 503
+DEFAULT_QUEUE_LIMIT = 64
+RETRY_AFTER_SECONDS = 1
+
+
+class PasswordPoolFull(Exception):
+    """Raised when more password hashes are queued than the pool accepts."""
+
+
+class _PasswordPool:
+    """Runs bcrypt on a bounded thread pool instead of the request thread.
+
+    bcrypt releases the GIL, so the workers hash in parallel while request
+    threads only wait. Admission is capped at workers + queue_limit so a login
+    storm gets fast 503s instead of an ever growing queue.
+    """
+
+    def __init__(self):
+        self.rounds = DEFAULT_ROUNDS
+        self._workers = os.cpu_count() or 1
+        self._queue_limit = DEFAULT_QUEUE_LIMIT
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[BoundedSemaphore] = None
+        self._lock = Lock()
+
+    def configure(self, rounds: int, workers: int, queue_limit: int) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self.rounds = rounds
+            self._workers = workers
+            self._queue_limit = queue_limit
+            self._executor = None
+            self._slots = None
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        executor, slots = self._get_executor()
+        if not slots.acquire(blocking=False):
+            raise PasswordPoolFull()
+        try:
+            future = executor.submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future.result()
+
+    def _get_executor(self) -> tuple[ThreadPoolExecutor, BoundedSemaphore]:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._workers, thread_name_prefix="bcrypt"
+                )
+                self._slots = BoundedSemaphore(self._workers + self._queue_limit)
+            return self._executor, self._slots
+
+
+_pool = _PasswordPool()
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+
+
+def hash_password(password: str) -> str:
+    return _pool.run(_hash, password, _pool.rounds)
+
+
+def check_password(password: str, hashed: str) -> bool:
+    return _pool.run(_check, password, hashed)
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True when the hash was made with a lower cost than the current one.
+
+    Hashes are never rehashed to a lower cost, that would only weaken them.
+    """
+    try:
+        # "$2b$12$<salt and hash>"
+        return int(hashed.split("$")[2]) < _pool.rounds
+    except (IndexError, ValueError):
+        return True
+
+
+def calibrate_rounds(target_ms: float = DEFAULT_TARGET_MS) -> int:
+    """Returns the highest cost whose hash takes at most target_ms here.
+
+    Each extra round doubles the work, so timing a cheap cost is enough.
+    Never returns less than MIN_ROUNDS.
+    """
+    sample = min(_time_hash(SAMPLE_ROUNDS) for _ in range(3))
+    if sample <= 0:
+        return MAX_ROUNDS
+    rounds = SAMPLE_ROUNDS + math.floor(math.log2(target_ms / 1000 / sample))
+    return max(MIN_ROUNDS, min(MAX_ROUNDS, rounds))
+
+
+def get_calibrated_rounds(path: str, target_ms: float = DEFAULT_TARGET_MS) -> int:
+    """The cost stored in path, calibrated and stored on first use.
+
+    Timing noise would otherwise give every restart and worker its own cost.
+    The first process to create the file wins, the others read its value.
+    Delete the file to calibrate again, e.g. after moving to other hardware.
+    """
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        pass
+
+    rounds = calibrate_rounds(target_ms)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        # Another worker calibrated at the same time, use its value
+        with open(path) as f:
+            return int(f.read().strip())
+    with os.fdopen(fd, "w") as f:
+        f.write(str(rounds))
+    log_info(f"Calibrated bcrypt cost to {rounds} rounds, stored in {path}")
+    return rounds
+
+
+def _time_hash(rounds: int) -> float:
+    start = time.perf_counter()
+    _hash("calibration", rounds)
+    return time.perf_counter() - start
+
+
+def init_passwords(app: Flask) -> None:
+    """Sets up the hashing pool from the app config.
+
+    BCRYPT_ROUNDS pins the cost, which is the way to go with several hosts.
+    Otherwise it is calibrated to BCRYPT_TARGET_MS once and kept in
+    BCRYPT_ROUNDS_FILE, bcrypt_rounds in the instance folder by default.
+    PASSWORD_WORKERS and PASSWORD_QUEUE_LIMIT size the pool.
+    """
+    rounds = app.config.get("BCRYPT_ROUNDS")
+    if rounds is None:
+        rounds = get_calibrated_rounds(
+            app.config.get("BCRYPT_ROUNDS_FILE") or os.path.join(app.instance_path, "bcrypt_rounds"),
+            app.config.get("BCRYPT_TARGET_MS", DEFAULT_TARGET_MS),
+        )
+
+    _pool.configure(
+        rounds=rounds,
+        workers=app.config.get("PASSWORD_WORKERS") or os.cpu_count() or 1,
+        queue_limit=app.config.get("PASSWORD_QUEUE_LIMIT", DEFAULT_QUEUE_LIMIT),
+    )
+    app.register_error_handler(PasswordPoolFull, lambda e: password_pool_full_response())
+
+
+def password_pool_full_response():
+    response = jsonify({"message": "Server is busy, try again shortly"})
+    response.headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+    return response, 503
+
+
+class PasswordHasher:
+    """Hashes many passwords at once on a pool of worker processes.
+
+    Meant for bulk operations such as imports, which would otherwise hold every
+    slot of the request pool. Use as a context manager so the workers are shut
+    down afterwards.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "PasswordHasher":
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def hash_many(self, passwords: list[str]) -> list[str]:
+        hash_one = partial(_hash, rounds=_pool.rounds)
+        if self._pool is None or len(passwords) < 2:
+            return [hash_one(password) for password in passwords]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._pool.map(hash_one, passwords, chunksize=chunksize))
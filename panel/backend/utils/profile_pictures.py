@@ -0,0 +1,161 @@
+import hashlib
+import os
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+from flask import has_request_context, url_for
+from PIL import Image
+from .logging import log_error, log_info
+from .table_versions import bump
+
+PROFILE_PICTURES_DIR = "./profile_pictures"
+MAX_PICTURE_BYTES = 2 * 1024 * 1024  # 2MB
+# Square renditions written next to the picture, served with ?size=
+RENDITION_SIZES = (256, 64, 32)
+# Larger uploads are scaled down, which lets JPEG decoding skip most of the work
+MAX_PICTURE_DIMENSION = 1024
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="profile-pictures")
+
+# userId -> (mtime_ns, size, content hash), so files are only re-hashed when they change
+_versions: dict[int, tuple[int, int, str]] = {}
+_versions_lock = Lock()
+
+
+class InvalidPicture(ValueError):
+    pass
+
+
+def get_path(userId: int, size: int | None = None) -> str:
+    name = f"{userId}.webp" if size is None else f"{userId}_{size}.webp"
+    return os.path.join(PROFILE_PICTURES_DIR, name)
+
+
+def validate(data: bytes) -> None:
+    """Checks size and header without decoding the pixels, raises InvalidPicture."""
+    if len(data) > MAX_PICTURE_BYTES:
+        raise InvalidPicture("Image size exceeds the limit of 2MB.")
+    try:
+        with Image.open(BytesIO(data)) as image:
+            image.verify()
+    except Exception as e:
+        raise InvalidPicture(f"Not a valid image: {str(e)}")
+
+
+def submit(userId: int, data: bytes) -> Future:
+    """Validates the upload and renders it on the background worker."""
+    validate(data)
+    future = _executor.submit(render, userId, data)
+    future.add_done_callback(lambda f: _log_failure(userId, f))
+    return future
+
+
+def render(userId: int, data: bytes) -> None:
+    """Writes the WebP picture and its renditions.
+
+    Renditions are written first and the main file last, so a new version,
+    which is derived from the main file, is only published once all sizes exist.
+    """
+    os.makedirs(PROFILE_PICTURES_DIR, exist_ok=True)
+    with Image.open(BytesIO(data)) as image:
+        # Lets the JPEG decoder downscale by 1/2..1/8 while decoding
+        image.draft("RGB", (MAX_PICTURE_DIMENSION, MAX_PICTURE_DIMENSION))
+        image.thumbnail((MAX_PICTURE_DIMENSION, MAX_PICTURE_DIMENSION))
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+        rendition = image
+        for size in RENDITION_SIZES:
+            # Each size is scaled from the previous, larger, one
+            rendition = rendition.copy()
+            rendition.thumbnail((size, size))
+            _write(get_path(userId, size), rendition)
+        _write(get_path(userId), image)
+
+    bump("Users")
+    log_info(f"Profile picture for user {userId} processed")
+
+
+def delete(userId: int) -> None:
+    for size in (None, *RENDITION_SIZES):
+        try:
+            os.remove(get_path(userId, size))
+        except FileNotFoundError:
+            pass
+    bump("Users")
+
+
+def _write(path: str, image: Image.Image) -> None:
+    # Written to a temporary file and renamed, readers never see a partial image.
+    # The name is unique, two renders of the same user never share a file.
+    with tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(path), suffix=".tmp", delete=False
+    ) as temporary:
+        try:
+            image.save(temporary, format="WEBP")
+        except BaseException:
+            temporary.close()
+            os.remove(temporary.name)
+            raise
+    os.replace(temporary.name, path)
+
+
+def _log_failure(userId: int, future: Future) -> None:
+    if future.exception() is not None:
+        log_error(f"Failed to process profile picture for user {userId}: {future.exception()}")
+
+
+def list_pictures() -> dict[int, os.stat_result]:
+    """Stats every stored profile picture with a single directory scan."""
+    pictures = {}
+    try:
+        with os.scandir(PROFILE_PICTURES_DIR) as entries:
+            for entry in entries:
+                name, extension = os.path.splitext(entry.name)
+                if extension == ".webp" and name.isdigit():
+                    pictures[int(name)] = entry.stat()
+    except FileNotFoundError:
+        pass
+    return pictures
+
+
+def get_version(userId: int, stat: os.stat_result | None = None) -> str | None:
+    """Returns a short content hash of the user's profile picture, None if there is none."""
+    if stat is None:
+        try:
+            stat = os.stat(get_path(userId))
+        except FileNotFoundError:
+            return None
+
+    with _versions_lock:
+        cached = _versions.get(userId)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    try:
+        with open(get_path(userId), "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    except FileNotFoundError:
+        return None
+
+    with _versions_lock:
+        _versions[userId] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def get_url(userId: int, version: str | None, size: int | None = None) -> str | None:
+    if version is None:
+        return None
+    params = {"v": version} if size is None else {"v": version, "size": size}
+    if has_request_context():
+        return url_for(
+            "users.fetch_profile_picture", userId=userId, **params, _external=True
+        )
+    return f"/fetch_profile_picture/{userId}?" + "&".join(f"{k}={v}" for k, v in params.items())
+
+
+def get_rendition_urls(userId: int, version: str | None) -> dict[str, str] | None:
+    if version is None:
+        return None
+    return {str(size): get_url(userId, version, size) for size in RENDITION_SIZES}
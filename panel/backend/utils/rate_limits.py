@@ -0,0 +1,75 @@
+from flask import Flask, current_app, jsonify, request
+from flask_jwt_extended import decode_token
+from flask_limiter import Limiter, RateLimitExceeded
+from flask_limiter.util import get_remote_address
+
+# Limits for the expensive routes, checked before the view runs, so a rejected
+# request never reaches bcrypt or Pillow. Overridable through RATE_LIMITS.
+DEFAULT_ROUTE_LIMITS = {
+    "sign_in": "10 per minute;50 per hour",
+    "sign_in_username": "5 per minute;20 per hour",
+    "sign_up": "5 per minute;20 per hour",
+    "create_random_user": "30 per minute",
+    "upload_profile_picture": "10 per minute",
+}
+
+
+def get_user_key() -> str:
+    """The user id from the access token cookie, else the client IP.
+
+    Only decodes the token, the user is not loaded for rate limiting.
+    """
+    token = request.cookies.get(current_app.config.get("JWT_ACCESS_COOKIE_NAME", "access_token_cookie"))
+    if token:
+        try:
+            return f"user:{decode_token(token)['sub']}"
+        except Exception:
+            pass
+    return f"ip:{get_remote_address()}"
+
+
+def get_ip_key() -> str:
+    return f"ip:{get_remote_address()}"
+
+
+def get_username_key() -> str:
+    # Spreading guesses for one account over many IPs still hits this limit
+    data = request.get_json(silent=True) or {}
+    return f"username:{str(data.get('username', '')).lower()}"
+
+
+def is_failed_sign_in(response) -> bool:
+    # Only wrong passwords count against an account, so others cannot lock it out by signing in
+    return response.status_code == 401
+
+
+limiter = Limiter(key_func=get_user_key)
+
+
+def route_limit(name: str):
+    """Limit for the given route, read from RATE_LIMITS at request time."""
+    return lambda: current_app.config.get("RATE_LIMITS", {}).get(name, DEFAULT_ROUTE_LIMITS[name])
+
+
+def init_rate_limits(app: Flask) -> None:
+    """Sets up the limiter from the app config, after the blueprints are registered.
+
+    Counters use a moving window kept in RATELIMIT_STORAGE_URI, memory:// for a
+    single worker, a shared store such as redis:// when running several.
+    BLUEPRINT_RATE_LIMITS maps blueprint names to a limit shared by all of
+    their routes, per user or IP.
+    """
+    app.config.setdefault("RATELIMIT_STORAGE_URI", "memory://")
+    app.config.setdefault("RATELIMIT_STRATEGY", "moving-window")
+    app.config.setdefault("RATELIMIT_HEADERS_ENABLED", True)
+    limiter.init_app(app)
+
+    for name, limit in app.config.get("BLUEPRINT_RATE_LIMITS", {}).items():
+        limiter.limit(limit)(app.blueprints[name])
+
+    app.register_error_handler(RateLimitExceeded, rate_limit_exceeded_response)
+
+
+def rate_limit_exceeded_response(e: RateLimitExceeded):
+    # Retry-After and X-RateLimit-* are added by the limiter after this
+    return jsonify({"message": f"Too many requests, limit is {e.description}"}), 429
@@ -0,0 +1,49 @@
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator
+from flask import Response, current_app, request, stream_with_context
+from .logging import log_error
+
+STREAM_BATCH_SIZE = 500
+
+
+def wants_stream() -> bool:
+    return request.args.get("stream", "").lower() in ("true", "1", "yes")
+
+
+def stream_json(items: Iterable[Any]) -> Response:
+    """Emits items as a JSON array one element at a time instead of building it in memory."""
+
+    def generate() -> Iterator[str]:
+        separator = ""
+        yield "["
+        try:
+            for item in items:
+                yield separator + current_app.json.dumps(item)
+                separator = ","
+        except Exception as e:
+            # Headers are already sent, so the client just sees a truncated body
+            log_error(f"Failed while streaming response: {str(e)}")
+            raise
+        yield "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def stream_query(
+    query,
+    serialize: Callable[[list], list[dict[str, Any]]],
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> Response:
+    """Streams the rows of a query as a JSON array.
+
+    Rows are fetched with yield_per and handed to ``serialize`` in batches, so
+    batch serializers such as User.to_dict_batch keep their fixed query count
+    per batch while memory stays bounded by the batch size.
+    """
+
+    def items() -> Iterator[dict[str, Any]]:
+        rows = iter(query.yield_per(batch_size))
+        while batch := list(islice(rows, batch_size)):
+            yield from serialize(batch)
+
+    return stream_json(items())
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+from typing import Any, Callable, Mapping, Optional
+from flask import Response, request
+from ..database.database import current_datetime
+from ..database.models import DELETED_ROW_RETENTION, DeletedRow
+from .pagination import MAX_LIMIT, ListParams, parse_datetime
+
+# Rows stamped just before the watermark may commit just after it, so each
+# watermark is moved back a little. Clients apply changes as idempotent upserts.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def parse_since(raw: Optional[str] = None) -> Optional[datetime]:
+    """Parses ?since=, raises ValueError when it is not a date."""
+    if raw is None:
+        raw = request.args.get("since")
+    if not raw:
+        return None
+    return parse_datetime(raw)
+
+
+def parse_sync_params(model: Any, timestamp: Any, args: Optional[Mapping[str, str]] = None) -> ListParams:
+    """Pages of a sync, keyset ordered by (timestamp, primary key).
+
+    ?limit= defaults to MAX_LIMIT and ?cursor= is the X-Next-Cursor of the
+    previous page. Raises ValueError for invalid parameters.
+    """
+    args = request.args if args is None else args
+    return ListParams(
+        model.__mapper__.primary_key[0],
+        {timestamp.key: timestamp},
+        args={
+            "sort": timestamp.key,
+            "limit": args.get("limit", str(MAX_LIMIT)),
+            "cursor": args.get("cursor"),
+        },
+    )
+
+
+def sync(
+    query,
+    model: Any,
+    timestamp: Any,
+    serialize: Callable[[list], list[dict[str, Any]]],
+    since: Optional[datetime],
+    params: ListParams,
+) -> tuple[Response, int]:
+    """Returns a page of the rows changed since the watermark.
+
+    Without a watermark, or with one older than DELETED_ROW_RETENTION, every
+    row is returned and "full" is true, the client then replaces what it has.
+    While X-Next-Cursor is set the client asks for the next page with the same
+    since=. The last page carries the deleted ids and the watermark to pass
+    back as ?since= on the next sync, other pages have none.
+    """
+    # Taken before reading, so nothing committed during the request is skipped next time.
+    # Rows edited while paging move past the cursor and come with a later page.
+    watermark = current_datetime().replace(tzinfo=None) - SYNC_OVERLAP
+
+    full = since is None or since < watermark - DELETED_ROW_RETENTION
+    if not full:
+        query = query.filter(timestamp >= since)
+    page = params.paginate(query)
+
+    last = page.next_cursor is None
+    deleted = (
+        DeletedRow.get_ids_since(model.__tablename__, since) if last and not full else []
+    )
+
+    return page.response(
+        {
+            "changed": serialize(page.items),
+            "deleted": deleted,
+            "full": full,
+            "watermark": watermark.isoformat() if last else None,
+        }
+    )
@@ -0,0 +1,142 @@
+import time
+import uuid
+from collections import defaultdict
+from functools import wraps
+from itertools import chain
+from threading import Lock
+from typing import Any, Optional
+from flask import make_response, request
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session as OrmSession
+from .. import db
+
+# Changes on every start, so ETags handed out by a previous process never match
+_epoch = uuid.uuid4().hex[:8]
+# Bumped after commits of this process and for changes outside the database
+_versions: defaultdict[str, int] = defaultdict(int)
+_versions_lock = Lock()
+
+# Writes of other processes (CLI commands, other workers, sqlite3) only show up
+# in TableVersions, which is re-read after this long
+VERSION_TTL_SECONDS = 1.0
+
+
+class _StoredVersions:
+    """TableVersions rows, bumped by triggers in the writing transaction.
+
+    Cached for VERSION_TTL_SECONDS, a commit in this process drops the cache
+    right away. Before migration 3 the table is missing and every version is 0.
+    """
+
+    def __init__(self):
+        self._versions: dict[str, int] = {}
+        self._read_at: Optional[float] = None
+        self._lock = Lock()
+
+    def get(self, table: str) -> int:
+        now = time.monotonic()
+        with self._lock:
+            if self._read_at is not None and now - self._read_at < VERSION_TTL_SECONDS:
+                return self._versions.get(table, 0)
+        versions = read_versions()
+        with self._lock:
+            self._versions, self._read_at = versions, now
+        return versions.get(table, 0)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._read_at = None
+
+
+_stored = _StoredVersions()
+
+
+def read_versions() -> dict[str, int]:
+    """Reads every TableVersions row, bypassing the cache."""
+    try:
+        with db.engine.connect() as connection:
+            return dict(
+                connection.exec_driver_sql("SELECT tableName, version FROM TableVersions").all()
+            )
+    except OperationalError:
+        return {}
+
+
+def bump(*tables: str) -> None:
+    with _versions_lock:
+        for table in tables:
+            _versions[table] += 1
+    _stored.invalidate()
+
+
+def get_version(table: str) -> str:
+    with _versions_lock:
+        local = _versions[table]
+    return f"{_stored.get(table)}.{local}"
+
+
+def get_etag(*tables: str) -> str:
+    return _epoch + "-" + "-".join(get_version(table) for table in tables)
+
+
+def conditional(*models: Any):
+    """Answers If-None-Match with 304 while none of the models' tables changed.
+
+    The ETag is taken before the view runs, so a commit that lands while the
+    response is being built can only make the client refetch, never cache stale data.
+    """
+    tables = tuple(model.__tablename__ for model in models)
+
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            etag = get_etag(*tables)
+            if request.if_none_match.contains(etag):
+                response = make_response("", 304)
+                response.set_etag(etag)
+                return response
+
+            response = make_response(fn(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.cache_control.no_cache = True
+            return response
+
+        return decorator
+
+    return wrapper
+
+
+def _pending(session: OrmSession) -> set[str]:
+    return session.info.setdefault("changed_tables", set())
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_flushed_tables(session: OrmSession, flush_context) -> None:
+    _pending(session).update(
+        obj.__tablename__
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if hasattr(obj, "__tablename__")
+    )
+
+
+@event.listens_for(OrmSession, "do_orm_execute")
+def _collect_bulk_tables(orm_execute_state) -> None:
+    # Query.delete()/update() and insert(Model) statements bypass the flush
+    if orm_execute_state.is_select or orm_execute_state.bind_mapper is None:
+        return
+    _pending(orm_execute_state.session).add(
+        orm_execute_state.bind_mapper.local_table.name
+    )
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _bump_committed_tables(session: OrmSession) -> None:
+    # Bumping only after commit keeps readers from pairing a new ETag with old rows
+    bump(*session.info.pop("changed_tables", ()))
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_rolled_back_tables(session: OrmSession) -> None:
+    session.info.pop("changed_tables", None)
@@ -1,7 +1,7 @@
-from .invite import read_invite_codes
 from .. import crypto as c
 import re
 from .logging import log_error
+from .hwid_registry import hwid_registry
 
 male_names = [
     "James", "John", "Robert", "Michael", "William", "David", "Joseph", "Daniel", "Thomas", "Charles",
@@ -89,16 +89,11 @@ def get_payload(payload):
 
      
 def check_hwid(data : str) -> bool:
-    hwids = ["12953453", "0x64ftntdqvntrpoa", "499523841"] # tohle potom bude z SQL database 
-    for HWID in hwids:
-        print(f"checking if HWID {HWID} is in string {data}")
-        if HWID in data:
-            return True
-    return False
+    # Exact lookups in the registry of Users.HWID, no scan over known HWIDs
+    return hwid_registry.match(data) is not None
 
 
 def heartbeat_auth(data) -> str | tuple | bytes:
-    iter = False
     print(f"received data: {data}")
     stringa = c.decrypt(data, privateKey)
     payload = get_payload(str(stringa))
@@ -107,13 +102,7 @@ def heartbeat_auth(data) -> str | tuple | bytes:
     if not payload:
         return "Bad request.", 201
     
-    codes = read_invite_codes("./logs/invite_codes.txt")
-    
-    for code in codes:
-        if code in payload:
-            iter = True
-            
-    if not iter:
+    if not check_hwid(payload):
         return "User not found.", 201
 
     print(stringa)
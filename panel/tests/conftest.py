@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set before test modules import backend, database.database connects at import
+os.environ["DATABASE_URI"] = f"sqlite:///{tempfile.mkdtemp(prefix='panel-')}/database.sqlite"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+
+@pytest.fixture(scope="session")
+def app():
+    from backend import create_app
+    from backend.utils.rate_limits import limiter
+
+    app = create_app()
+    app.config["TESTING"] = True
+    # Read by init_app only, changing RATELIMIT_ENABLED afterwards has no effect
+    limiter.enabled = False
+    # The test client talks plain http
+    app.config["JWT_COOKIE_SECURE"] = False
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
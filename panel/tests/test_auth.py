@@ -0,0 +1,45 @@
+import pytest
+from backend import db
+from backend.database.models import User
+from backend.utils.rate_limits import limiter
+
+
+def sign_up_and_in(client, username: str) -> None:
+    credentials = {"username": username, "email": f"{username}@ombra.test", "password": "Password1!"}
+    assert client.post("/sign_up", json=credentials).status_code == 201
+    assert client.post("/sign_in", json=credentials).status_code == 200
+
+
+@pytest.mark.parametrize("claims", [False, True])
+def test_token_of_deleted_user_is_rejected(app, client, claims):
+    app.config["JWT_AUTHORIZATION_CLAIMS"] = claims
+    username = f"deleted_{int(claims)}"
+    sign_up_and_in(client, username)
+    assert client.get("/auth_status").get_json()["isAuthenticated"] is True
+
+    with app.app_context():
+        db.session.delete(User.get_by_username(username))
+        db.session.commit()
+
+    # Deleting the user also makes the claims stale, which must not turn into a 500
+    response = client.get("/auth_status")
+    assert response.status_code == 401
+
+
+def test_successful_sign_ins_do_not_count_against_the_username_limit(app, client):
+    limiter.enabled = True
+    app.config["RATE_LIMITS"] = {"sign_in": "100 per minute", "sign_in_username": "2 per minute"}
+    try:
+        credentials = {"username": "limited", "email": "limited@ombra.test", "password": "Password1!"}
+        assert client.post("/sign_up", json=credentials).status_code == 201
+        for _ in range(3):
+            assert client.post("/sign_in", json=credentials).status_code == 200
+
+        wrong = {**credentials, "password": "wrong"}
+        assert client.post("/sign_in", json=wrong).status_code == 401
+        assert client.post("/sign_in", json=wrong).status_code == 401
+        assert client.post("/sign_in", json=credentials).status_code == 429
+    finally:
+        limiter.enabled = False
+        limiter.reset()
+        app.config.pop("RATE_LIMITS")
@@ -0,0 +1,24 @@
+import sqlite3
+from backend import db
+from backend.database.models import Role, User, UserRole, role_cache
+from backend.utils import table_versions
+from test_auth import sign_up_and_in
+
+
+def test_role_cache_notices_writes_of_other_processes(app, client, monkeypatch):
+    sign_up_and_in(client, "revoked")
+    with app.app_context():
+        role = Role(name="Revoked", description="Revoked role", color="#010203")
+        db.session.add(role)
+        db.session.flush()
+        userId = User.get_by_username("revoked").userId
+        db.session.add(UserRole(userId=userId, roleId=role.roleId))
+        db.session.commit()
+        assert role.roleId in role_cache.get_role_ids(userId)
+
+        # Another process, the triggers bump TableVersions but not this process' counters
+        with sqlite3.connect(db.engine.url.database) as connection:
+            connection.execute("DELETE FROM UserRoles WHERE userId = ?", (userId,))
+
+        monkeypatch.setattr(table_versions, "VERSION_TTL_SECONDS", 0)
+        assert role.roleId not in role_cache.get_role_ids(userId)
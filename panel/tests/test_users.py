@@ -0,0 +1,20 @@
+import pytest
+from test_auth import sign_up_and_in
+
+ADMIN_ROUTES = [
+    "/import_users",
+    "/bulk_update_user_status",
+]
+
+
+@pytest.mark.parametrize("path", ADMIN_ROUTES)
+def test_admin_routes_require_a_token(client, path):
+    assert client.post(path).status_code == 401
+
+
+@pytest.mark.parametrize("path", ADMIN_ROUTES)
+def test_admin_routes_require_a_permission(app, path):
+    client = app.test_client()
+    sign_up_and_in(client, f"member_{path.strip('/')}")
+    csrf = client.get_cookie("csrf_access_token").value
+    assert client.post(path, json={}, headers={"X-CSRF-TOKEN": csrf}).status_code == 403